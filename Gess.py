@@ -1,25 +1,22 @@
-import pygame
-from GessBackend import Selection, Piece, GessGame
+import argparse
+import os
+from collections import OrderedDict
+from GessBackend import GessGame
+from GessEngine import format_move
+from GessHistory import MoveHistory
+from GessPonder import BackgroundEngine
 
+# PyGame is imported by main, so importing this module does not load SDL.
+pygame = None
 
-# Helper functions
-def draw_board():
-    """Method for placing stones onto board.
+# Directory holding the image assets
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
 
-    :param: no value
-    :return: no value
-    """
-    pieces.fill(PURPLE)
-    for stone in black_stones:
-        for key, value in square_dict.items():
-            if key == stone:
-                pygame.draw.circle(pieces, BLACK, value.center, 10)
-    for stone in white_stones:
-        for key, value in square_dict.items():
-            if key == stone:
-                pygame.draw.circle(pieces, WHITE, value.center, 10)
+# Frame rate cap. The loop sleeps until an event arrives, so this only limits bursts of input.
+MAX_FPS = 30
 
 
+# Helper functions
 def coord_converter(coord):
     """Converts coordinate from numeric to alphanumeric.
 
@@ -33,148 +30,463 @@ def coord_converter(coord):
     return chr(coord[0]+97) + str(coord[1] + 1)
 
 
-# Initialize PyGame
-pygame.init()
-
-# Initialize colors
-BLACK = pygame.Color('black')
-RED = pygame.Color('red')
-WHITE = pygame.Color('white')
-PURPLE = pygame.Color('purple')
-BLUE = pygame.Color('blue')
-
-# Create window, set background image
-screen = pygame.display.set_mode((600,600))
-screen.fill((255,255,255))
-pygame.display.set_caption("Gess")
-background_img = pygame.image.load("bamboo_art.jpg")
-
-# Set font sizes
-font = pygame.font.Font(None, 36)
-font_small = pygame.font.Font(None, 22)
-
-# Set board dimensions
-tile_size = 25
-width, height = 20*tile_size, 20*tile_size
-
-# Set up Surfaces for game board, pieces, and move overlay
-background = pygame.Surface((width, height))
-background.fill((222,184,135))
-pieces = pygame.Surface((width, height))
-pieces.fill(PURPLE)
-pieces.set_colorkey(PURPLE)
-overlay = pygame.Surface((width, height))
-overlay.fill(PURPLE)
-overlay.set_colorkey(PURPLE)
-
-# Draw board grid
-rect_list = []
-square_dict = {}
-for y in range(0, height, tile_size):
-    for x in range(0, width, tile_size):
-        rect = (x, y, tile_size, tile_size)
-        square = pygame.Rect(rect)
-        rect_list.append(square)
-        pygame.draw.rect(background, BLACK, square, 1)
-pygame.draw.rect(background, BLACK, (0,0,500,500), 3)
-
-# Create rects for overlay
-small_rect_1 = pygame.Rect(0,0,22,22)
-small_rect_2 = pygame.Rect(0,0,22,22)
-
-# Assign grid square rects to coordinates
-x_coord, y_coord = 0,19
-for square in rect_list:
-    square_dict[(x_coord, y_coord)] = square
-    x_coord += 1
-    if x_coord == 20:
-        x_coord = 0
-        y_coord -= 1
-
-# Initialize backend code
-GG = GessGame()
-
-# Initialize variables
-clicked_1 = 0
-clicked_2 = 0
-start_coord = ""
-end_coord = ""
-message = ""
-
-# Game loop
-running = True
-while running:
-
-    # Updates list of stones
-    black_stones = GG.get_black_stones()
-    white_stones = GG.get_white_stones()
-
-    # Updating text reflecting current game state
-    for event in pygame.event.get():
-        draw_board()
-        if GG.get_game_state() != "UNFINISHED":
-            turn_text = font.render(GG.get_curr_player() + " WON!", True, BLACK)
-        else:
-            turn_text = font.render(GG.get_curr_player() + "'S TURN", True, BLACK)
-
-        move_from = font_small.render("Start: " + start_coord, True, BLACK)
-        move_to = font_small.render("End: " + end_coord, True, BLACK)
-        black_num, white_num = str(len(black_stones)), str(len(white_stones))
-        error_message = font_small.render(message, True, BLACK)
-
-        if event.type == pygame.QUIT:
-            running = 0
-        # Logic for making game moves. Gets position of cursor when left mouse button is clicked and attempts to make move.
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            pos = list(pygame.mouse.get_pos())
-            adjusted_pos = (pos[0]-50, pos[1]-50)
-            for square in rect_list:
-                if square.collidepoint(adjusted_pos):
-                    for key, value in square_dict.items():
-                        if value == square:
-                            # If no square has been clicked yet, draw red square reflecting start of move
-                            if clicked_1 == 0:
-                                small_rect_1.center = (square.center[0], square.center[1])
-                                pygame.draw.rect(overlay, RED, small_rect_1, 2)
-                                clicked_1 = key
-                                start_coord = coord_converter(key)
-                                message = ""
-                            # If second square has not been clicked yet, draw blue square reflecting end of move
-                            elif clicked_2 == 0:
-                                small_rect_2.center = (square.center[0], square.center[1])
-                                pygame.draw.rect(overlay, BLUE, small_rect_2, 2)
-                                clicked_2 = key
-                                end_coord = coord_converter(key)
-                                end_square = square
-                            # If both move start and move finish square have been clicked. send coordinates to back end to attempt move
-                            elif clicked_1 != 0 and clicked_2 != 0:
-                                if end_square.collidepoint(adjusted_pos):
-                                    result = GG.make_move(clicked_1, clicked_2)
-                                    if result is True:
-                                        message = ""
-                                    else:
-                                        message = result
-                                clicked_1, clicked_2 = 0, 0
-                                start_coord, end_coord = "", ""
-
-                                overlay.fill(PURPLE)
-
-    # Blitting background
-    screen.blit(background_img, (0,0))
-    screen.blit(background, (50, 50))
-
-    # Blitting pieces and overlay
-    screen.blit(pieces, (50, 50))
-    screen.blit(overlay, (50,50))
-
-    # Blitting text surfaces
-    screen.blit(turn_text, [200, 15])
-    screen.blit(move_from, [50,565])
-    screen.blit(move_to, [150,565])
-    screen.blit(error_message, [250, 565])
-
-    # Refreshing display
-    pygame.display.flip()
-
+class GessWindow:
+    """Represents the Gess game window. Holds the PyGame Surfaces and the state of the move being entered, and
+    includes methods for drawing the board and handling clicks. Interacts with the GessGame class for each move.
 
+    :param game: Game to display and play
+    :type game: GessGame
+    :param computer: Player moved by the computer, "BLACK" or "WHITE", or None for two human players
+    :type computer: str
+    :param think_time: Seconds the computer spends choosing each move
+    :type think_time: float
+    """
 
+    TEXT_CACHE_SIZE = 32
+
+    def __init__(self, game, computer=None, think_time=2.0):
+        """Opens the window, loads the background image, and draws the board grid."""
+
+        self.GG = game
+
+        # The computer player searches in a background thread and posts its moves to the event queue
+        self.computer = computer
+        self.opponent = BackgroundEngine(self.post_engine_move, think_time=think_time) if computer else None
+
+        # Initialize colors
+        self.BLACK = pygame.Color('black')
+        self.RED = pygame.Color('red')
+        self.WHITE = pygame.Color('white')
+        self.PURPLE = pygame.Color('purple')
+        self.BLUE = pygame.Color('blue')
+
+        # Create window, set background image
+        self.screen = pygame.display.set_mode((600,600))
+        self.screen.fill((255,255,255))
+        pygame.display.set_caption("Gess")
+        self.background_img = pygame.image.load(os.path.join(ASSET_DIR, "bamboo_art.jpg")).convert()
+
+        # Set font sizes
+        self.font = pygame.font.Font(None, 36)
+        self.font_small = pygame.font.Font(None, 22)
+        self.text_cache = OrderedDict()
+
+        # Set board dimensions
+        self.tile_size = 25
+        self.width, self.height = 20*self.tile_size, 20*self.tile_size
+        self.board_offset = (50, 50)
+
+        # Window areas holding the turn text and the move and error text
+        self.text_areas = [pygame.Rect(0, 0, 600, 50), pygame.Rect(0, 550, 600, 50)]
+
+        # Move history, and the timeline bar below the board that seeks through it when clicked or dragged
+        self.history = MoveHistory(game)
+        self.timeline_rect = pygame.Rect(50, 584, 500, 10)
+        self.dragging = False
+
+        # Set up Surfaces for game board, pieces, and move overlay
+        self.background = pygame.Surface((self.width, self.height)).convert()
+        self.background.fill((222,184,135))
+        self.pieces = pygame.Surface((self.width, self.height)).convert()
+        self.pieces.fill(self.PURPLE)
+        self.pieces.set_colorkey(self.PURPLE)
+        self.overlay = pygame.Surface((self.width, self.height)).convert()
+        self.overlay.fill(self.PURPLE)
+        self.overlay.set_colorkey(self.PURPLE)
+
+        # Draw board grid
+        for y in range(0, self.height, self.tile_size):
+            for x in range(0, self.width, self.tile_size):
+                pygame.draw.rect(self.background, self.BLACK, (x, y, self.tile_size, self.tile_size), 1)
+        pygame.draw.rect(self.background, self.BLACK, (0,0,500,500), 3)
+
+        # Create rects for overlay
+        self.small_rect_1 = pygame.Rect(0,0,22,22)
+        self.small_rect_2 = pygame.Rect(0,0,22,22)
+
+        # Initialize variables
+        self.clicked_1 = 0
+        self.clicked_2 = 0
+        self.start_coord = ""
+        self.end_coord = ""
+        self.message = ""
+        self.drawn_stones = {}
+        self.drawn_text = None
+        self.dirty_squares = set()
+
+    def square_rect(self, coord):
+        """Returns the board Surface rect of the square at a coordinate.
+
+        :param coord: numerical coordinate
+        :type coord: tuple
+        :return: rect of the square, relative to the board Surfaces
+        :rtype: pygame.Rect
+        """
+        return pygame.Rect(coord[0]*self.tile_size, (19-coord[1])*self.tile_size, self.tile_size, self.tile_size)
+
+    def pos_to_coord(self, pos):
+        """Converts a pixel position in the window to the coordinate of the square under it.
+
+        :param pos: pixel position in the window
+        :type pos: tuple
+        :return: numerical coordinate, or None if the position is not on the board
+        :rtype: tuple
+        """
+        x, y = pos[0] - self.board_offset[0], pos[1] - self.board_offset[1]
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return x // self.tile_size, 19 - y // self.tile_size
+
+    def draw_board(self):
+        """Method for placing stones onto board. Only squares whose stone changed since the last call are redrawn, and
+        they are added to the set of dirty squares.
+
+        :param: no value
+        :return: no value
+        """
+        stones = dict.fromkeys(self.GG.get_black_stones(), self.BLACK)
+        stones.update(dict.fromkeys(self.GG.get_white_stones(), self.WHITE))
+        for coord in set(stones) | set(self.drawn_stones):
+            color = stones.get(coord)
+            if self.drawn_stones.get(coord) != color:
+                rect = self.square_rect(coord)
+                self.pieces.fill(self.PURPLE, rect)
+                if color is not None:
+                    pygame.draw.circle(self.pieces, color, rect.center, 10)
+                self.dirty_squares.add(coord)
+        self.drawn_stones = stones
+
+    def render_text(self, text, text_font):
+        """Returns the rendered Surface for a string. The most recently used TEXT_CACHE_SIZE string and font pairs are
+        kept, so fixed labels are rendered once while move counters and computer messages do not pile up.
+
+        :param text: text to render
+        :type text: str
+        :param text_font: font to render with
+        :type text_font: pygame.font.Font
+        :return: rendered text
+        :rtype: pygame.Surface
+        """
+        key = (text, text_font)
+        if key in self.text_cache:
+            self.text_cache.move_to_end(key)
+        else:
+            self.text_cache[key] = text_font.render(text, True, self.BLACK)
+            if len(self.text_cache) > self.TEXT_CACHE_SIZE:
+                self.text_cache.popitem(last=False)
+        return self.text_cache[key]
+
+    def redraw_screen(self):
+        """Blits the dirty squares and any changed text onto the window, then updates only those areas of the display.
+
+        :param: no value
+        :return: no value
+        """
+        dirty_rects = []
+        for coord in self.dirty_squares:
+            rect = self.square_rect(coord)
+            screen_rect = rect.move(self.board_offset)
+            self.screen.blit(self.background, screen_rect, rect)
+            self.screen.blit(self.pieces, screen_rect, rect)
+            self.screen.blit(self.overlay, screen_rect, rect)
+            dirty_rects.append(screen_rect)
+        self.dirty_squares.clear()
+
+        # Text only changes when a square is clicked or a move is made
+        if self.GG.get_game_state() != "UNFINISHED":
+            turn_text = self.GG.get_game_state().replace("_", " ") + "!"
+        else:
+            turn_text = self.GG.get_curr_player() + "'S TURN"
+        ply_text = "Move {}/{}".format(self.history.get_ply(), len(self.history))
+        text = (turn_text, "Start: " + self.start_coord, "End: " + self.end_coord, self.message, ply_text)
+        if text != self.drawn_text:
+            for area in self.text_areas:
+                self.screen.blit(self.background_img, area, area)
+            self.screen.blit(self.render_text(text[0], self.font), [200, 15])
+            self.screen.blit(self.render_text(text[1], self.font_small), [50, 565])
+            self.screen.blit(self.render_text(text[2], self.font_small), [150, 565])
+            self.screen.blit(self.render_text(text[3], self.font_small), [250, 565])
+            self.screen.blit(self.render_text(text[4], self.font_small), [470, 20])
+            self.draw_timeline()
+            dirty_rects.extend(self.text_areas)
+            self.drawn_text = text
+
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+
+    def draw_timeline(self):
+        """Draws the timeline bar, filled up to the ply being shown.
+
+        :param: no value
+        :return: no value
+        """
+        pygame.draw.rect(self.screen, self.WHITE, self.timeline_rect)
+        if len(self.history):
+            filled = self.timeline_rect.width * self.history.get_ply() // len(self.history)
+            pygame.draw.rect(self.screen, self.BLACK, (self.timeline_rect.x, self.timeline_rect.y, filled,
+                                                       self.timeline_rect.height))
+        pygame.draw.rect(self.screen, self.BLACK, self.timeline_rect, 1)
+
+    def redraw_all(self):
+        """Marks every square and the text as dirty, and repaints the whole window.
+
+        :param: no value
+        :return: no value
+        """
+        self.screen.blit(self.background_img, (0,0))
+        self.dirty_squares.update((x, y) for x in range(20) for y in range(20))
+        self.drawn_text = None
+        self.redraw_screen()
+        pygame.display.flip()
+
+    def is_computer_turn(self):
+        """Returns True if the game is unfinished and the computer player is to move."""
+        return self.opponent is not None and self.GG.get_game_state() == "UNFINISHED" and \
+            self.GG.get_curr_player() == self.computer
+
+    def start_computer_turn(self):
+        """Starts the computer player's search if it is to move. Returns without waiting for the move.
+
+        :param: no value
+        :return: no value
+        """
+        if self.is_computer_turn():
+            self.opponent.think(self.GG)
+            self.message = "Computer is thinking..."
+
+    def post_engine_move(self, key, result):
+        """Called from the computer player's search thread with a chosen move. Posts it to the event queue, so the move
+        is made by the game loop.
+
+        :param key: hash of the position searched
+        :type key: int
+        :param result: result of the search
+        :type result: SearchResult
+        :return: no value
+        """
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT, key=key, result=result))
+
+    def handle_engine_move(self, key, result):
+        """Makes the computer player's move if it is for the current position, then starts pondering on the predicted
+        reply while the human player thinks. A move the game rejects is shown as a message and not recorded. If the
+        computer has no legal move it resigns, so the game ends instead of waiting on it, and can still be undone.
+
+        :param key: hash of the position searched
+        :type key: int
+        :param result: result of the search
+        :type result: SearchResult
+        :return: no value
+        """
+        if not self.is_computer_turn() or self.history.can_redo() or key != self.GG.get_hash():
+            return
+        if result.best_move is None:
+            self.GG.resign_game()
+            self.message = "Computer has no legal move and resigns"
+            self.draw_board()
+            return
+        move_result = self.GG.make_move(*result.best_move)
+        if move_result is not True:
+            self.message = "Computer: " + move_result
+            self.draw_board()
+            return
+        self.history.record(self.GG, result.best_move)
+        self.message = "Computer: " + format_move(result.best_move)
+        self.draw_board()
+        self.opponent.ponder(self.GG)
+
+    def seek(self, ply):
+        """Shows the game at a ply of the move history. Any move being entered is cancelled, and the computer player
+        stops searching. The computer only plays when the last ply is shown, so earlier plies can be reviewed.
+
+        :param ply: ply to show, clamped to the history
+        :type ply: int
+        :return: no value
+        """
+        if self.opponent is not None:
+            self.opponent.cancel()
+        self.GG = self.history.seek(ply)
+        self.clear_selection()
+        self.message = ""
+        self.draw_board()
+        if not self.history.can_redo():
+            self.start_computer_turn()
+
+    def undo(self):
+        """Steps back a ply. Against the computer, steps back to the human player's previous turn.
+
+        :param: no value
+        :return: no value
+        """
+        ply = self.history.get_ply() - 1
+        while self.opponent is not None and ply > 0 and self.history.game_at(ply).get_curr_player() == self.computer:
+            ply -= 1
+        self.seek(ply)
+
+    def redo(self):
+        """Steps forward a ply. Against the computer, steps forward to the human player's next turn or the last ply.
+
+        :param: no value
+        :return: no value
+        """
+        ply = self.history.get_ply() + 1
+        while self.opponent is not None and ply < len(self.history) and \
+                self.history.game_at(ply).get_curr_player() == self.computer:
+            ply += 1
+        self.seek(ply)
+
+    def timeline_ply(self, pos):
+        """Converts a pixel position to the ply at that point of the timeline.
+
+        :param pos: pixel position in the window
+        :type pos: tuple
+        :return: ply of the move history
+        :rtype: int
+        """
+        fraction = (pos[0] - self.timeline_rect.x) / self.timeline_rect.width
+        return round(max(0.0, min(1.0, fraction)) * len(self.history))
+
+    def handle_key(self, event):
+        """Keyboard controls for the move history: Left or Ctrl+Z to undo, Right or Ctrl+Y to redo, and Home or End to
+        show the first or last ply.
+
+        :param event: KEYDOWN event
+        :type event: pygame.event.Event
+        :return: no value
+        """
+        ctrl = event.mod & pygame.KMOD_CTRL
+        if event.key == pygame.K_LEFT or (ctrl and event.key == pygame.K_z):
+            self.undo()
+        elif event.key == pygame.K_RIGHT or (ctrl and event.key == pygame.K_y):
+            self.redo()
+        elif event.key == pygame.K_HOME:
+            self.seek(0)
+        elif event.key == pygame.K_END:
+            self.seek(len(self.history))
+
+    def clear_selection(self):
+        """Removes the start and end markers of the move being entered.
+
+        :param: no value
+        :return: no value
+        """
+        for key in (self.clicked_1, self.clicked_2):
+            if key != 0:
+                self.overlay.fill(self.PURPLE, self.square_rect(key))
+                self.dirty_squares.add(key)
+        self.clicked_1, self.clicked_2 = 0, 0
+        self.start_coord, self.end_coord = "", ""
+
+    def handle_click(self, key):
+        """Logic for making game moves. Marks the start and end of a move on successive clicks, and attempts the move
+        when the end square is clicked again. Any other third click cancels the move.
+
+        :param key: numerical coordinate of the clicked square
+        :type key: tuple
+        :return: no value
+        """
+        # Clicks are ignored while the computer player is choosing its move
+        if self.is_computer_turn():
+            return
+        # If no square has been clicked yet, draw red square reflecting start of move
+        elif self.clicked_1 == 0:
+            self.small_rect_1.center = self.square_rect(key).center
+            pygame.draw.rect(self.overlay, self.RED, self.small_rect_1, 2)
+            self.dirty_squares.add(key)
+            self.clicked_1 = key
+            self.start_coord = coord_converter(key)
+            self.message = ""
+        # If second square has not been clicked yet, draw blue square reflecting end of move
+        elif self.clicked_2 == 0:
+            self.small_rect_2.center = self.square_rect(key).center
+            pygame.draw.rect(self.overlay, self.BLUE, self.small_rect_2, 2)
+            self.dirty_squares.add(key)
+            self.clicked_2 = key
+            self.end_coord = coord_converter(key)
+        # If both move start and move finish square have been clicked. send coordinates to back end to attempt move
+        else:
+            if key == self.clicked_2:
+                result = self.GG.make_move(self.clicked_1, self.clicked_2)
+                if result is True:
+                    self.history.record(self.GG, (self.clicked_1, self.clicked_2))
+                    self.message = ""
+                    self.start_computer_turn()
+                else:
+                    self.message = result
+                self.draw_board()
+            self.clear_selection()
+
+    def run(self):
+        """Game loop. Sleeps until an event arrives, handles it along with any others already queued, then redraws what
+        changed. Returns when the window is closed.
+
+        :param: no value
+        :return: no value
+        """
+        # Only wake up for events the game handles
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.VIDEOEXPOSE,
+                                  pygame.USEREVENT])
+
+        self.start_computer_turn()
+        self.draw_board()
+        self.redraw_all()
+        clock = pygame.time.Clock()
+
+        running = True
+        while running:
+            for event in [pygame.event.wait()] + pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.VIDEOEXPOSE:
+                    self.redraw_all()
+                elif event.type == pygame.USEREVENT:
+                    self.handle_engine_move(event.key, event.result)
+                elif event.type == pygame.KEYDOWN:
+                    self.handle_key(event)
+                # Mouse motion is only allowed while the timeline is dragged, so the loop stays asleep otherwise
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and \
+                        self.timeline_rect.inflate(0, 10).collidepoint(event.pos):
+                    self.dragging = True
+                    pygame.event.set_allowed([pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP])
+                    self.seek(self.timeline_ply(event.pos))
+                elif event.type == pygame.MOUSEMOTION and self.dragging:
+                    ply = self.timeline_ply(event.pos)
+                    if ply != self.history.get_ply():
+                        self.seek(ply)
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.dragging:
+                    self.dragging = False
+                    pygame.event.set_blocked([pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP])
+                # Gets the square under the cursor when left mouse button is clicked
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    key = self.pos_to_coord(event.pos)
+                    if key is not None:
+                        self.handle_click(key)
+
+            # Blitting the changed squares and text, and capping the frame rate
+            if running:
+                self.redraw_screen()
+                clock.tick(MAX_FPS)
+
+        if self.opponent is not None:
+            self.opponent.cancel()
+
+
+def main():
+    """Initializes PyGame and runs the game until the window is closed. By default two people play, and the
+    --computer option lets the computer play one side."""
+    parser = argparse.ArgumentParser(description="Play Gess in a window.")
+    parser.add_argument("--computer", choices=["black", "white"], default=None, help="side played by the computer")
+    parser.add_argument("--time", type=float, default=2.0, help="seconds the computer thinks per move")
+    args = parser.parse_args()
+
+    global pygame
+    import pygame
+    pygame.init()
+    try:
+        GessWindow(GessGame(), args.computer.upper() if args.computer else None, args.time).run()
+    finally:
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
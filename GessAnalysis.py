@@ -0,0 +1,183 @@
+# Description: Streaming, multi-core statistics over archives of Gess game records. Replays every game through the
+# rules engine to collect results, game lengths, captures and a legality audit, using constant memory.
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from GessBackend import GessGame, BitboardGessGame, RESULT_CODES
+from GessRecord import GameArchive, HEADER, MOVE_SIZE
+
+BACKENDS = {"list": GessGame, "bitboard": BitboardGessGame}
+
+
+class ArchiveStats:
+    """Represents statistics gathered from replayed games. Each worker fills its own ArchiveStats, and the results
+    are combined with merge as they arrive. Every counter is either a total or a histogram keyed by a small value,
+    so memory does not grow with the number of games."""
+
+    def __init__(self):
+        """Initializes empty statistics."""
+        self.games = 0
+        self.moves = 0
+        self.results = {"BLACK_WON": 0, "WHITE_WON": 0, "UNFINISHED": 0}
+        self.lengths = {}
+        self.captured = 0
+        self.self_captured = 0
+        self.capturing_moves = 0
+        self.rings_broken = 0
+        self.illegal_moves = {}
+        self.illegal_games = 0
+        self.state_mismatches = 0
+
+    def add_game(self, game_class, record):
+        """Replays one GameRecord through a new game of the given class and adds it to the statistics. Replay stops at
+        the first move the rules engine rejects, which is counted by its result code in the legality audit."""
+        game = game_class()
+        num_moves = 0
+        for move in record.moves:
+            curr_sym = game.get_curr_player()[0]
+            opp_sym = "W" if curr_sym == "B" else "B"
+            before = (game.get_stone_count(curr_sym), game.get_stone_count(opp_sym), game.get_ring_count(opp_sym))
+            result = game.make_move(*move)
+            if result is not True:
+                code = RESULT_CODES[result]
+                if code in ("INVALID_SELECTION", "INVALID_MOVE"):
+                    code = game.invalid_move_reason(*move) or code
+                self.illegal_moves[code] = self.illegal_moves.get(code, 0) + 1
+                self.illegal_games += 1
+                break
+            num_moves += 1
+
+            # The moving Piece may drop stones off the edge or land on its own stones, so stones lost by the mover
+            # are counted separately from captures of the opponent's stones.
+            captured = before[1] - game.get_stone_count(opp_sym)
+            self.captured += captured
+            self.capturing_moves += captured > 0
+            self.self_captured += max(0, before[0] - game.get_stone_count(curr_sym))
+            self.rings_broken += max(0, before[2] - game.get_ring_count(opp_sym))
+
+        self.games += 1
+        self.moves += num_moves
+        self.results[record.game_state] += 1
+        self.lengths[num_moves] = self.lengths.get(num_moves, 0) + 1
+        if game.get_game_state() != record.game_state and num_moves == len(record.moves):
+            self.state_mismatches += 1
+
+    def merge(self, other):
+        """Adds the statistics of another ArchiveStats into this one."""
+        for name in ("games", "moves", "captured", "self_captured", "capturing_moves", "rings_broken",
+                     "illegal_games", "state_mismatches"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in ("results", "lengths", "illegal_moves"):
+            counts = getattr(self, name)
+            for key, count in getattr(other, name).items():
+                counts[key] = counts.get(key, 0) + count
+
+    def length_percentile(self, fraction):
+        """Returns the game length at the given fraction (0 to 1) of games, from the length histogram."""
+        target, seen = fraction * self.games, 0
+        for length in sorted(self.lengths):
+            seen += self.lengths[length]
+            if seen >= target:
+                return length
+        return 0
+
+    def summary(self):
+        """Returns the statistics as a dictionary that can be written as JSON."""
+        decided = self.results["BLACK_WON"] + self.results["WHITE_WON"]
+        return {"games": self.games, "moves": self.moves, "results": dict(self.results),
+                "black_win_rate": self.results["BLACK_WON"] / decided if decided else None,
+                "white_win_rate": self.results["WHITE_WON"] / decided if decided else None,
+                "length": {"mean": self.moves / self.games if self.games else 0,
+                           "min": min(self.lengths, default=0), "max": max(self.lengths, default=0),
+                           "p50": self.length_percentile(0.5), "p90": self.length_percentile(0.9)},
+                "captures": {"stones": self.captured, "per_game": self.captured / self.games if self.games else 0,
+                             "capturing_moves": self.capturing_moves, "self_captured": self.self_captured,
+                             "rings_broken": self.rings_broken},
+                "audit": {"illegal_moves": dict(self.illegal_moves), "illegal_games": self.illegal_games,
+                          "state_mismatches": self.state_mismatches}}
+
+
+def iter_chunks(paths, chunk_size):
+    """Generator that splits archives into chunks of about chunk_size games, yielding (path, start, end) byte ranges.
+    Only record headers are read, so chunks are produced as the archives are scanned."""
+    for path in paths:
+        with GameArchive(path) as archive:
+            start, count, end = None, 0, None
+            for offset, game_state, num_moves in archive.headers():
+                if start is None:
+                    start = offset
+                count += 1
+                end = offset + HEADER.size + num_moves * MOVE_SIZE
+                if count == chunk_size:
+                    yield path, start, end
+                    start, count = None, 0
+            if start is not None:
+                yield path, start, end
+
+
+def _analyze_chunk(job):
+    """Worker function for analyze. Maps an archive, replays the records in one byte range and returns their
+    ArchiveStats."""
+    path, start, end, backend = job
+    stats = ArchiveStats()
+    with GameArchive(path) as archive:
+        for offset, _, _ in archive.headers(start, end):
+            stats.add_game(BACKENDS[backend], archive.record_at(offset))
+    return stats
+
+
+def analyze(paths, workers=None, chunk_size=256, backend="bitboard"):
+    """Replays every game in a list of archives across a process pool and returns the merged ArchiveStats. Workers
+    read their own byte ranges of the archives, so only ranges and statistics cross process boundaries. At most two
+    chunks per worker are in flight, and each result is merged as soon as it arrives, so memory stays constant
+    however large the archives are.
+
+    :param paths: Paths of GessRecord files
+    :type paths: list
+    :param workers: Number of worker processes, or None for one per core
+    :type workers: int
+    :param chunk_size: Number of games per chunk sent to a worker
+    :type chunk_size: int
+    :param backend: Rules engine used for replay, "list" or "bitboard"
+    :type backend: str
+    :return: Statistics of every game
+    :rtype: ArchiveStats
+    """
+
+    workers = workers or os.cpu_count() or 1
+    total = ArchiveStats()
+    chunks = iter_chunks(paths, chunk_size)
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        for path, start, end in chunks:
+            pending.add(executor.submit(_analyze_chunk, (path, start, end, backend)))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for job in done:
+                    total.merge(job.result())
+        for job in pending:
+            total.merge(job.result())
+    return total
+
+
+def main():
+    """Analyzes one or more game record files and prints the statistics as JSON."""
+    parser = argparse.ArgumentParser(description="Gather statistics from Gess game record archives.")
+    parser.add_argument("paths", nargs="+", help="game record files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--chunk", type=int, default=256, help="games per worker chunk")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard", help="rules engine for replay")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    output = analyze(args.paths, args.workers, args.chunk, args.backend).summary()
+    output["seconds"] = time.perf_counter() - start_time
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,118 @@
 # Date: 5/18/2020
 # Description: Text-based implementation of the board game Gess.
 
+import random
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
+# Directions a Piece can move in, in the order legal moves are generated.
+MOVE_DIRECTIONS = ("DL", "L", "UL", "D", "U", "DR", "R", "UR")
+
+# Offsets of the eight stones surrounding a ring center.
+RING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Zobrist keys for a stone of each color on each of the 400 squares (indexed by row * 20 + col), and for white to
+# move. A fixed seed keeps position hashes identical across runs and processes.
+_zobrist_random = random.Random(0x6E55)
+ZOBRIST_KEYS = {symbol: [_zobrist_random.getrandbits(64) for _ in range(400)] for symbol in ("B", "W")}
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+del _zobrist_random
+
+
+def zobrist_hash(black_stones, white_stones, curr_player):
+    """Computes the 64-bit Zobrist hash of a position from scratch. Takes lists of black and white stones and the
+    current player ("BLACK" or "WHITE") as parameters. Returns the hash as an integer."""
+    position_hash = ZOBRIST_SIDE if curr_player == "WHITE" else 0
+    for symbol, stone_list in (("B", black_stones), ("W", white_stones)):
+        for stone in stone_list:
+            position_hash ^= ZOBRIST_KEYS[symbol][stone[1] * 20 + stone[0]]
+    return position_hash
+
+
+# Game states in the order they are numbered in packed positions.
+GAME_STATES = ("UNFINISHED", "BLACK_WON", "WHITE_WON")
+
+# Result code recorded by instrumented games for each make_move result.
+RESULT_CODES = {True: "OK", "Game is over!": "GAME_OVER", "Invalid selection - try again!": "INVALID_SELECTION",
+                "Invalid move - try again!": "INVALID_MOVE", "Other stones in the way of move - try again!": "BLOCKED",
+                "Move leaves you without a ring - try again!": "RING_LOSS"}
+
+# Reasons for invalid selections and invalid moves, as returned by GessGame.invalid_move_reason.
+REJECTION_REASONS = ("OUT_OF_BOUNDS", "OPPONENT_IN_SELECTION", "PIECE_CANNOT_MOVE", "NOT_STRAIGHT_LINE",
+                     "DIRECTION_NOT_ALLOWED", "OUT_OF_RANGE")
+
+
+def coord_to_text(coord):
+    """Converts a number-number coordinate to the letter-number coordinate system. For example, (0, 2) converts to
+    'a3'. Inverse of GessGame.coord_converter."""
+    return chr(coord[0] + 97) + str(coord[1] + 1)
+
+
+# Positions within a footprint, in the order footprints are listed, and the (col, row) offset of each position from the
+# center.
+PIECE_DIRS = ("DL", "L", "UL", "D", "C", "U", "DR", "R", "UR")
+DIR_OFFSETS = {"DL": (-1, -1), "L": (-1, 0), "UL": (-1, 1), "D": (0, -1), "C": (0, 0), "U": (0, 1), "DR": (1, -1),
+               "R": (1, 0), "UR": (1, 1)}
+
+# Bit of each footprint position in a 9-bit Piece pattern, listed in footprint order. Bits are numbered row by row from
+# the lower left, which matches the layout of a footprint within a bitboard.
+PATTERN_BITS = tuple(1 << ((DIR_OFFSETS[direction][1] + 1) * 3 + DIR_OFFSETS[direction][0] + 1)
+                     for direction in PIECE_DIRS)
+
+
+def footprint_cells(center):
+    """Returns the nine coordinates in the footprint of a center as a tuple, listed in PIECE_DIRS order."""
+    return tuple((center[0] + DIR_OFFSETS[direction][0], center[1] + DIR_OFFSETS[direction][1])
+                 for direction in PIECE_DIRS)
+
+
+def _build_move_tables():
+    """Builds the load-once tables used to validate moves: footprints of every valid center, the swept cells of every
+    (center, direction) ray, the allowed directions and range of every Piece pattern, and the direction and distance
+    of every straight-line move."""
+
+    footprints = {(col, row): footprint_cells((col, row)) for col in range(1, 19) for row in range(1, 19)}
+    footprint_bits = {center: dict(zip(footprint, PATTERN_BITS)) for center, footprint in footprints.items()}
+
+    # Cells of every intermediate footprint along each ray, in the order the ray reaches them. A move of distance d
+    # sweeps the first ends[d] cells. After the first intermediate footprint, each step only adds the cells on the
+    # leading edge of the footprint.
+    sweep_cells = {}
+    for direction in MOVE_DIRECTIONS:
+        col_step, row_step = DIR_OFFSETS[direction]
+        edge = [offset for offset in RING_OFFSETS + ((0, 0),)
+                if not (-1 <= offset[0] + col_step <= 1 and -1 <= offset[1] + row_step <= 1)]
+        for col, row in footprints:
+            # Number of steps before the end center leaves the valid centers.
+            max_distance = min(18 - col if col_step > 0 else col - 1 if col_step < 0 else 17,
+                               18 - row if row_step > 0 else row - 1 if row_step < 0 else 17)
+            if max_distance < 2:
+                sweep_cells[((col, row), direction)] = ((), (0, 0))
+                continue
+            cells = list(footprints[(col + col_step, row + row_step)])
+            cells += [(col + step * col_step + offset[0], row + step * row_step + offset[1])
+                      for step in range(2, max_distance) for offset in edge]
+            ends = (0, 0) + tuple(9 + len(edge) * (distance - 2) for distance in range(2, max_distance + 1))
+            sweep_cells[((col, row), direction)] = (tuple(cells), ends)
+
+    # Allowed directions and range of every pattern. A Piece that cannot move has a range of 0.
+    piece_moves = []
+    for pattern in range(512):
+        move_dirs = frozenset(direction for direction, bit in zip(PIECE_DIRS, PATTERN_BITS) if pattern & bit)
+        piece_moves.append((move_dirs, 0 if move_dirs <= {"C"} else 99 if "C" in move_dirs else 3))
+
+    move_deltas = {(distance * DIR_OFFSETS[direction][0], distance * DIR_OFFSETS[direction][1]): (direction, distance)
+                   for direction in MOVE_DIRECTIONS for distance in range(1, 18)}
+    return footprints, footprint_bits, sweep_cells, tuple(piece_moves), move_deltas
+
+
+# FOOTPRINTS maps each valid center to its footprint, and FOOTPRINT_BITS maps each cell of that footprint to its
+# pattern bit. SWEEP_CELLS maps (center, direction) to the cells swept along that ray and the number swept by a move of
+# each distance. PIECE_MOVES maps a Piece pattern to its allowed directions and range. MOVE_DELTAS maps the (col, row)
+# change of a straight-line move to its direction and distance.
+FOOTPRINTS, FOOTPRINT_BITS, SWEEP_CELLS, PIECE_MOVES, MOVE_DELTAS = _build_move_tables()
+
 
 class Selection:
     """Represents a 3x3 Selection. Includes methods for finding the footprint of a selection, and checking if
@@ -14,8 +126,7 @@ class Selection:
     def __init__(self, center):
         """Initializes Selection by setting center of selection and calculating footprint of selection."""
         self._center = center
-        self._footprint = [(self._center[0] + num1, self._center[1] + num2) for num1 in range(-1, 2) for num2 in
-                           range(-1, 2)]
+        self._footprint = FOOTPRINTS.get(center) or footprint_cells(center)
 
     def footprint(self):
         """Returns coordinates of spaces in footprint. Takes no parameters."""
@@ -38,23 +149,30 @@ class Piece(Selection):
 
     def __init__(self, center, curr_player_stones):
         """Initializes Piece. Takes center coordinate and a list of the current player's stones as parameters.
-        Creates dictionary that corresponds each cardinal direction to a space in the footprint. Calculates which
-        of the current player's stones are in the Piece's footprint."""
+        Calculates which of the current player's stones are in the Piece's footprint, and the 9-bit pattern they
+        form."""
 
         super().__init__(center)
-        self._dirs = ["DL", "L", "UL", "D", "C", "U", "DR", "R", "UR"]
-        self._dir_coords = {self._dirs[i]: self._footprint[i] for i in range(len(self._dirs))}
-        self._contained_stones = [stone for stone in curr_player_stones if stone in self.footprint()]
+        cell_bits = FOOTPRINT_BITS.get(center) or dict(zip(self._footprint, PATTERN_BITS))
+        self._contained_stones = [stone for stone in curr_player_stones if stone in cell_bits]
+        self._pattern = sum(cell_bits[stone] for stone in self._contained_stones)
 
     def contained_stones(self):
         """Returns the stones contained in the Piece. Takes no parameters."""
         return self._contained_stones
 
+    def pattern(self):
+        """Returns the 9-bit pattern of contained stones, numbered as in PATTERN_BITS. Takes no parameters."""
+        return self._pattern
+
     def move_dirs(self):
-        """Returns the allowed move directions based on contained stones. Takes no parameters"""
-        move_dirs = {key for key, value in self._dir_coords.items() for stone in self._contained_stones if
-                     stone == value}
-        return move_dirs
+        """Returns the allowed move directions based on contained stones as a frozenset. Takes no parameters"""
+        return PIECE_MOVES[self._pattern][0]
+
+    def move_range(self):
+        """Returns how many squares the Piece can move: 99 with a center stone, 3 without one, or 0 if the Piece cannot
+        move. Takes no parameters."""
+        return PIECE_MOVES[self._pattern][1]
 
 
 class GessGame:
@@ -89,6 +207,25 @@ class GessGame:
         for stone in self._white_stones:
             self._board[stone[1]][stone[0]] = "W"
 
+        # Centers of every complete ring for each player. Kept up to date by place_stone and remove_stone, which only
+        # recheck the ring centers next to the changed square. The list board's ring_at is called directly, since
+        # subclasses such as BitboardGessGame build their own board from this one afterwards.
+        self._rings = {"B": set(), "W": set()}
+        for center in ((col, row) for col in range(2, 18) for row in range(2, 18)):
+            for symbol in self._rings:
+                if GessGame.ring_at(self, center, symbol):
+                    self._rings[symbol].add(center)
+
+        # Zobrist hash of the position. Kept up to date by place_stone, remove_stone and every change of player.
+        self._hash = zobrist_hash(self._black_stones, self._white_stones, self._curr_player)
+
+        # Stack of moves that can be reversed with undo_move. Each entry holds the stones removed and added by a move
+        # along with the current player and game state from before the move.
+        self._undo_stack = []
+
+        # MoveStats collecting counters and timings, or None while instrumentation is disabled.
+        self._instrumentation = None
+
     def get_black_stones(self):
         """Returns list of black stones.
 
@@ -108,6 +245,58 @@ class GessGame:
         """Returns current game state. Takes no parameters"""
         return self._game_state
 
+    def get_ring_count(self, symbol):
+        """Returns the number of complete rings for the player with the given symbol ('B' or 'W')."""
+        return len(self._rings[symbol])
+
+    def get_stone_count(self, symbol):
+        """Returns the number of stones for the player with the given symbol ('B' or 'W')."""
+        return len(self._black_stones if symbol == "B" else self._white_stones)
+
+    def get_hash(self):
+        """Returns the 64-bit Zobrist hash of the position, including the player to move. Takes no parameters."""
+        return self._hash
+
+    def get_bits(self, symbol):
+        """Returns a bitboard of the stones for the player with the given symbol ('B' or 'W')."""
+        return stones_to_bits(self._black_stones if symbol == "B" else self._white_stones)
+
+    def to_bytes(self):
+        """Packs the position into 102 bytes: the black and white bitboards (50 bytes each, little-endian), followed by
+        one byte for the current player and one byte for the game state. Move history is not included. Takes no
+        parameters."""
+        return (self.get_bits("B").to_bytes(50, "little") + self.get_bits("W").to_bytes(50, "little") +
+                bytes((self._curr_player == "WHITE", GAME_STATES.index(self._game_state))))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates a game from a position packed by to_bytes. The game is built directly from the packed bitboards,
+        without setting up the starting position first. Takes the packed bytes as a parameter and returns a new game of
+        this class with an empty undo stack."""
+        game = cls.__new__(cls)
+        game._curr_player, game._opp_player = ("WHITE", "BLACK") if data[100] else ("BLACK", "WHITE")
+        game._game_state = GAME_STATES[data[101]]
+        game._undo_stack, game._instrumentation = [], None
+        game.load_bits(int.from_bytes(data[:50], "little"), int.from_bytes(data[50:100], "little"))
+        return game
+
+    def get_position(self):
+        """Returns an immutable Position snapshot of the game. Takes no parameters."""
+        return Position(self.to_bytes())
+
+    def load_bits(self, black_bits, white_bits):
+        """Replaces every stone on the board with the stones of a black and a white bitboard. Ring centers and the hash
+        are computed from the bitboards directly. Takes the two bitboards as parameters."""
+        self._black_stones, self._white_stones = bits_to_stones(black_bits), bits_to_stones(white_bits)
+        self._board = [["-"] * 20 for _ in range(20)]
+        for symbol, stone_list in (("B", self._black_stones), ("W", self._white_stones)):
+            for stone in stone_list:
+                self._board[stone[1]][stone[0]] = symbol
+        self._rings = {"B": set(bits_to_stones(bits_ring_centers(black_bits))),
+                       "W": set(bits_to_stones(bits_ring_centers(white_bits)))}
+        self._hash = bits_zobrist(black_bits, "B") ^ bits_zobrist(white_bits, "W") ^ \
+            (ZOBRIST_SIDE if self._curr_player == "WHITE" else 0)
+
     def coord_converter(self, coordinate):
         """Converts letter-number coordinate to number-number coordinate system used in program. Takes the coordinate
         to convert as parameter and returns the converted coordinate."""
@@ -128,24 +317,12 @@ class GessGame:
         if self._game_state != "UNFINISHED":
             return "Game is over!"
 
-        # Sets current player stones, symbol, and initializes start/end Selection objects for proposed move.
+        # Sets current player stones, and checks the selection with the _select_piece method.
         curr_player_stones, opp_player_stones = self.player_stone_selector()
-        curr_player_sym = self._curr_player[0]
-        start_sel, end_sel = Selection(start_center), Selection(end_center)
-
-        # Checks if starting and ending locations are valid with check_valid_selection method.
-        if not start_sel.check_valid_selection() or not end_sel.check_valid_selection():
-            return "Invalid selection - try again!"
-
-        # Checking starting footprint for any of opponent's stones. Also will prevent moving out of turn.
-        start_footprint = start_sel.footprint()
-        opp_stones_in_sel = any(stone in opp_player_stones for stone in start_footprint)
-        if opp_stones_in_sel:
+        moving_piece = self._select_piece(start_center, end_center)
+        if moving_piece is None:
             return "Invalid selection - try again!"
 
-        # Initializing Piece object that will be moving.
-        moving_piece = Piece(start_center, curr_player_stones)
-
         # Getting stones contained in Piece and checking if move is allowed based on direction and range.
         contained_stones = moving_piece.contained_stones()
         move_dir_range = self.check_dir_range(start_center, end_center, moving_piece)
@@ -154,44 +331,177 @@ class GessGame:
         else:
             move_dir, move_range = move_dir_range
 
-        # Gets list of current player's stones that aren't moving, and runs collision checking method.
-        curr_stationary_stones = [stone for stone in curr_player_stones if stone not in contained_stones]
-        stationary_stones = set(opp_player_stones + curr_stationary_stones)
+        # Gets set of stones that aren't moving, and runs collision checking method.
+        stationary_stones = set(opp_player_stones).union(curr_player_stones).difference(contained_stones)
         if not self.collision_checker(start_center, move_dir, move_range, stationary_stones):
             return "Other stones in the way of move - try again!"
 
-        # Setting backup lists for restoring board if necessary.
-        backup_black, backup_white = self._black_stones[:], self._white_stones[:]
+        # Applies the move. apply_move rolls the move back if it leaves the current player without a ring.
+        if not self.apply_move(start_center, end_center):
+            return "Move leaves you without a ring - try again!"
+        return True
+
+    def _select_piece(self, start_center, end_center):
+        """Helper function for make_move that checks the selection of a move. Checks that the starting and ending
+        locations are valid, and that the starting footprint holds none of the opponent's stones, which also prevents
+        moving out of turn. Takes starting and ending coordinates of move as parameters. Returns the Piece that would
+        move, or None if the selection is invalid."""
+
+        # Checks if starting and ending locations are valid with check_valid_selection method.
+        start_sel, end_sel = Selection(start_center), Selection(end_center)
+        if not start_sel.check_valid_selection() or not end_sel.check_valid_selection():
+            return None
+
+        # Checking starting footprint for any of opponent's stones.
+        start_footprint = start_sel.footprint()
+        board, curr_player_sym = self._board, self._curr_player[0]
+        if any(board[stone[1]][stone[0]] not in ("-", curr_player_sym) for stone in start_footprint):
+            return None
+
+        # Initializing Piece object that will be moving, from the current player's stones in the footprint.
+        return Piece(start_center, [stone for stone in start_footprint if board[stone[1]][stone[0]] == curr_player_sym])
+
+    def apply_move(self, start_center, end_center):
+        """Function for applying a move that has already passed the checks in make_move, such as a move yielded by
+        legal_moves. Records only the stones removed and added by the move on the undo stack, so the move can be
+        reversed with undo_move. Updates game state and switches players in the same way as make_move. If the move
+        leaves the current player without a ring, it is undone immediately. Takes starting and ending coordinates of
+        move as parameters. Returns True if move is applied, otherwise False."""
+
+        curr_player_stones, opp_player_stones = self.player_stone_selector()
+        curr_player_sym, opp_player_sym = self._curr_player[0], self._opp_player[0]
+        moving_piece = Piece(start_center, [stone for stone in Selection(start_center).footprint() if
+                                            self._board[stone[1]][stone[0]] == curr_player_sym])
 
         # Removing current player's stones from starting footprint.
-        for stone in contained_stones:
+        removed = []
+        for stone in moving_piece.contained_stones():
             self.remove_stone(stone, curr_player_stones)
+            removed.append((stone, curr_player_sym))
 
         # Removing both player's stones from ending footprint.
-        for stone in end_sel.footprint():
-            if stone in curr_stationary_stones:
-                self.remove_stone(stone, curr_player_stones)
-            elif stone in opp_player_stones:
-                self.remove_stone(stone, opp_player_stones)
+        self._capture_stones(end_center, removed)
 
-        # Uses stone_mover method to place stones at new location in proper place.
+        # Uses stone_mover method to place stones at new location, and saves the move to the undo stack.
+        num_stones = len(curr_player_stones)
         self.stone_mover(end_center, moving_piece.move_dirs(), curr_player_stones, curr_player_sym)
+        added = tuple(curr_player_stones[num_stones:])
+        self._undo_stack.append((tuple(removed), added, self._curr_player, self._game_state))
 
-        # If move results in current player losing their last ring, restores board to state from before attempted move.
-        if not self.ring_checker(curr_player_stones):
-            self.restore_board(backup_black, backup_white)
-            return "Move leaves you without a ring - try again!"
+        # If move results in current player losing their last ring, undoes the move.
+        if not self._rings[curr_player_sym]:
+            self.undo_move()
+            return False
 
-        # If move results in opponent losing their last ring, changes game state to reflect win, switches players, and
-        # returns True.
-        if not self.ring_checker(opp_player_stones):
+        # If move results in opponent losing their last ring, changes game state to reflect win.
+        if not self._rings[opp_player_sym]:
             self._game_state = self._curr_player + "_WON"
             return True
 
-        # Move is successful. Switches players for next move and returns True.
+        # Move is successful. Switches players for next move.
         self._curr_player, self._opp_player = self._opp_player, self._curr_player
+        self._hash ^= ZOBRIST_SIDE
+        return True
+
+    def _capture_stones(self, end_center, removed):
+        """Helper function for apply_move. Removes both players' stones from the ending footprint of a move. Takes the
+        ending center of move and the list of (stone, symbol) pairs removed by the move, which is extended, as
+        parameters."""
+
+        stone_lists = {"B": self._black_stones, "W": self._white_stones}
+        for stone in FOOTPRINTS[end_center]:
+            symbol = self._board[stone[1]][stone[0]]
+            if symbol != "-":
+                self.remove_stone(stone, stone_lists[symbol])
+                removed.append((stone, symbol))
+
+    def undo_move(self):
+        """Reverses the most recent move made with make_move or apply_move using the undo stack. Removes the stones
+        added by the move, puts back the stones it removed, and restores the game state and current player. Takes no
+        parameters. Returns True if a move was undone, or False if there are no moves to undo."""
+
+        if not self._undo_stack:
+            return False
+        removed, added, curr_player, game_state = self._undo_stack.pop()
+
+        # Restoring players first, so the stone lists are selected for the player who made the move.
+        if self._curr_player != curr_player:
+            self._hash ^= ZOBRIST_SIDE
+        self._curr_player, self._game_state = curr_player, game_state
+        self._opp_player = "WHITE" if curr_player == "BLACK" else "BLACK"
+        curr_player_stones, opp_player_stones = self.player_stone_selector()
+        for stone in added:
+            self.remove_stone(stone, curr_player_stones)
+        for stone, symbol in removed:
+            self.place_stone(stone, curr_player_stones if symbol == curr_player[0] else opp_player_stones, symbol)
         return True
 
+    def legal_moves(self):
+        """Generator that yields every legal move for the current player as a (start_center, end_center) tuple. A move
+        is yielded exactly when make_move would accept it, but each direction of a Piece is swept once, stopping at
+        the first footprint that contains a stationary stone. Takes no parameters and does not change the game."""
+
+        # No moves are available once the game is over.
+        if self._game_state != "UNFINISHED":
+            return
+
+        curr_player_stones, opp_player_stones = self.player_stone_selector()
+        curr_set, opp_set = set(curr_player_stones), set(opp_player_stones)
+        curr_rings = self._rings[self._curr_player[0]]
+
+        for start_center in ((col, row) for col in range(1, 19) for row in range(1, 19)):
+
+            # Skipping selections containing any of opponent's stones.
+            start_footprint = Selection(start_center).footprint()
+            if any(stone in opp_set for stone in start_footprint):
+                continue
+
+            # Finding allowed directions and range of Piece, skipping Pieces that cannot move.
+            moving_piece = Piece(start_center, [stone for stone in start_footprint if stone in curr_set])
+            valid_dirs, move_range = moving_piece.move_dirs(), moving_piece.move_range()
+            if not move_range:
+                continue
+
+            contained_stones = set(moving_piece.contained_stones())
+            stationary_stones = (curr_set - contained_stones) | opp_set
+
+            # Rings more than two squares from both centers are untouched by the move, so only moves that come near
+            # every remaining ring need the full ring check.
+            far_rings = [ring for ring in curr_rings if self._ring_distance(ring, start_center) > 2]
+            for move_dir in MOVE_DIRECTIONS:
+                if move_dir not in valid_dirs:
+                    continue
+                offsets = DIR_OFFSETS[move_dir]
+                for distance in range(1, move_range + 1):
+                    end_center = (start_center[0] + distance * offsets[0], start_center[1] + distance * offsets[1])
+                    end_footprint = FOOTPRINTS.get(end_center)
+                    if end_footprint is None:
+                        break
+                    if any(self._ring_distance(ring, end_center) > 2 for ring in far_rings) or \
+                            self._keeps_ring(moving_piece, end_center, end_footprint, curr_set - contained_stones):
+                        yield start_center, end_center
+
+                    # Footprint becomes an intermediate step for longer moves, so any stationary stone blocks the ray.
+                    if any(stone in stationary_stones for stone in end_footprint):
+                        break
+
+    def _keeps_ring(self, moving_piece, end_center, end_footprint, curr_stationary_stones):
+        """Helper function for legal_moves. Checks whether moving the Piece to end_center leaves the current player
+        with a ring. Takes the moving Piece, the end center and footprint, and a set of current player's stones not
+        in the Piece as parameters. Returns True if current player keeps a ring, otherwise False."""
+        new_stones = curr_stationary_stones.difference(end_footprint)
+        for direction in moving_piece.move_dirs():
+            offsets = DIR_OFFSETS[direction]
+            new_col, new_row = end_center[0] + offsets[0], end_center[1] + offsets[1]
+            if 0 < new_col < 19 and 0 < new_row < 19:
+                new_stones.add((new_col, new_row))
+        return self.ring_checker(new_stones)
+
+    def _ring_distance(self, ring_center, center):
+        """Helper function for legal_moves. Returns the number of king steps between a ring center and a Piece
+        center."""
+        return max(abs(ring_center[0] - center[0]), abs(ring_center[1] - center[1]))
+
     def player_stone_selector(self):
         """Helper function for assigning the correct list of stones to the current and opposing player. Takes no
         parameters and returns lists of stones for the current player and opposing player as a tuple.
@@ -210,101 +520,75 @@ class GessGame:
          Takes starting and ending coordinates of move and Piece object as parameters. Returns False if move is invalid,
          otherwise returns the direction and range of move as a tuple."""
 
-        # Getting valid move directions based on contained stones with the move_dirs method.
-        valid_dirs = piece.move_dirs()
+        # Looking up valid move directions and range for the pattern of contained stones.
+        return self.pattern_dir_range(start_center, end_center, piece.pattern())
 
-        # if only center stone is present, piece cannot move
-        if valid_dirs == {"C"}:
-            return False
+    def invalid_move_reason(self, start_center, end_center):
+        """Explains why make_move rejects a move as an invalid selection or an invalid move. Takes starting and ending
+        coordinates of move as parameters. Returns one of the REJECTION_REASONS codes, or None if the move passes the
+        selection, direction and range checks."""
 
-        # setting range for move, range is unlimited if center space is filled, otherwise range is 3 squares
-        elif "C" in valid_dirs:
-            move_range = 99
-        else:
-            move_range = 3
-
-        # Finding the direction and range of the attempted move with the find_dir_range method.
+        if start_center not in FOOTPRINTS or end_center not in FOOTPRINTS:
+            return "OUT_OF_BOUNDS"
+        curr_player_stones, opp_player_stones = self.player_stone_selector()
+        if not set(opp_player_stones).isdisjoint(FOOTPRINTS[start_center]):
+            return "OPPONENT_IN_SELECTION"
+        move_dirs, move_range = PIECE_MOVES[Piece(start_center, curr_player_stones).pattern()]
         move_dir_range = self.find_dir_range(start_center, end_center)
-        if not move_dir_range:
-            return False
-        elif move_dir_range[0] in valid_dirs and move_dir_range[1] <= move_range:
-            return move_dir_range[0], move_dir_range[1]
-        else:
-            return False
+        if not move_range:
+            return "PIECE_CANNOT_MOVE"
+        elif not move_dir_range:
+            return "NOT_STRAIGHT_LINE"
+        elif move_dir_range[0] not in move_dirs:
+            return "DIRECTION_NOT_ALLOWED"
+        elif move_dir_range[1] > move_range:
+            return "OUT_OF_RANGE"
+        return None
+
+    def pattern_dir_range(self, start_center, end_center, pattern):
+        """Helper function for checking a move against the directions and range allowed for a Piece pattern, using the
+        PIECE_MOVES and MOVE_DELTAS tables. Takes starting and ending coordinates of move and the 9-bit Piece pattern
+        as parameters. Returns False if move is invalid, otherwise returns the direction and range of move as a
+        tuple."""
+
+        valid_dirs, move_range = PIECE_MOVES[pattern]
+        move_dir_range = self.find_dir_range(start_center, end_center)
+        if move_dir_range and move_dir_range[0] in valid_dirs and move_dir_range[1] <= move_range:
+            return move_dir_range
+        return False
 
     def find_dir_range(self, start_center, end_center):
         """Helper function for finding the direction and range of a move. Used by check_dir_range method. Takes the
         starting and ending coordinates of move as parameters. If move direction corresponds to one of the allowed
         directions, returns the move direction and distance as a tuple. Otherwise, returns False"""
 
-        # Finding the change in x and y values
-        x_delta, y_delta = end_center[0] - start_center[0], end_center[1] - start_center[1]
-
-        # Returns direction and distance of move as a tuple
-        if x_delta == y_delta != 0:
-            if x_delta > 0:
-                return "UR", x_delta
-            elif x_delta < 0:
-                return "DL", abs(x_delta)
-
-        elif x_delta == - y_delta != 0:
-            if x_delta > 0:
-                return "DR", x_delta
-            elif x_delta < 0:
-                return "UL", abs(x_delta)
-
-        elif x_delta == 0:
-            if y_delta > 0:
-                return "U", y_delta
-            elif y_delta < 0:
-                return "D", abs(y_delta)
-
-        elif y_delta == 0:
-            if x_delta > 0:
-                return "R", x_delta
-            elif x_delta < 0:
-                return "L", abs(x_delta)
-
-        # Returns False if move is not in an allowed direction or if position has not changed.
-        else:
-            return False
+        # Looks up the change in x and y values. Returns False if move is not in an allowed direction or if position has
+        # not changed.
+        return MOVE_DELTAS.get((end_center[0] - start_center[0], end_center[1] - start_center[1]), False)
 
     def collision_checker(self, start_center, move_dir, move_range, stationary_stones):
         """Function for checking if premature collision occurs during attempted move. Takes the start location for move,
-        move direction, move range, and list of stones not involved in move as parameters. Returns False if move results
+        move direction, move range, and set of stones not involved in move as parameters. Returns False if move results
         in a premature collision, otherwise returns True."""
 
-        # Gets corresponding offset for given move direction from dir_offsets method
-        offsets = self.dir_offsets(move_dir)
-
-        # Iterates through intermediate moves to check for collisions
-        for i in range(1, move_range):
-            new_center = (start_center[0] + i * offsets[0], start_center[1] + i * offsets[1])
-            test_footprint = Selection(new_center).footprint()
-            if any(stone in stationary_stones for stone in test_footprint):
-                return False
-        return True
+        # Checks every cell swept by the intermediate footprints, looked up from SWEEP_CELLS. Footprints past the edge
+        # of the board cannot hold stones.
+        cells, ends = SWEEP_CELLS[(start_center, move_dir)]
+        return stationary_stones.isdisjoint(cells[:ends[min(move_range, len(ends) - 1)]])
 
     def dir_offsets(self, move_dir):
-        """Helper function that returns x and y offsets for a 1 unit move in any direction. Used during collision
-        checking. Takes the desired move direction as a parameter and returns the correct x,y offset as a tuple."""
-
-        offsets = {"DL": (-1, -1), "L": (-1, 0), "UL": (-1, 1), "D": (0, -1), "U": (0, 1), "DR": (1, -1), "R": (1, 0),
-                   "UR": (1, 1)}
-        return offsets[move_dir]
+        """Helper function that returns x and y offsets for a 1 unit move in any direction. Takes the desired move
+        direction as a parameter and returns the correct x,y offset as a tuple."""
+        return DIR_OFFSETS[move_dir]
 
     def stone_mover(self, center, directions, player_list, symbol):
         """Function for moving stones to new location during a move. Takes the center of new location, a list of
          directional positions of the stones to be moved, the current player's list of stones, and correct symbol
          for the stones."""
 
-        # Dictionary containing x,y offsets for each directional position
-        offsets = {"DL": (-1, -1), "L": (-1, 0), "UL": (-1, 1), "D": (0, -1), "U": (0, 1), "DR": (1, -1), "R": (1, 0),
-                   "UR": (1, 1), "C": (0, 0)}
-
         # Calculates new x,y coordinate for each stone based on their directional position.
         for direction in directions:
-            new_col, new_row = center[0] + offsets[direction][0], center[1] + offsets[direction][1]
+            new_col, new_row = center[0] + DIR_OFFSETS[direction][0], center[1] + DIR_OFFSETS[direction][1]
             if 0 < new_col < 19 and 0 < new_row < 19:
                 self.place_stone((new_col, new_row), player_list, symbol)
 
@@ -316,14 +600,41 @@ class GessGame:
 
         self._board[coord[1]][coord[0]] = symbol
         stone_list.append(coord)
+        self._ring_updater(coord, symbol)
+        self._hash ^= ZOBRIST_KEYS[symbol][coord[1] * 20 + coord[0]]
 
     def remove_stone(self, coord, stone_list):
         """Removes stone from board and removes from each player's list of stones. Due to list structure of board,
         stone coordinates are [col][row]. Takes coordinate of stone to be removed and the list where the coordinate of
         the stone is to be removed from as parameters."""
 
+        symbol = self._board[coord[1]][coord[0]]
         self._board[coord[1]][coord[0]] = "-"
         stone_list.remove(coord)
+        self._ring_updater(coord, symbol)
+        self._hash ^= ZOBRIST_KEYS[symbol][coord[1] * 20 + coord[0]]
+
+    def _ring_updater(self, coord, symbol):
+        """Helper function for place_stone and remove_stone. Updates the set of ring centers for a player after one of
+        their stones is placed or removed. Only the nine ring centers around the changed square can be affected. Takes
+        the coordinate of the changed square and the symbol ('B' or 'W') of the stone as parameters."""
+
+        rings = self._rings[symbol]
+        for col in range(coord[0] - 1, coord[0] + 2):
+            for row in range(coord[1] - 1, coord[1] + 2):
+                if self.ring_at((col, row), symbol):
+                    rings.add((col, row))
+                else:
+                    rings.discard((col, row))
+
+    def ring_at(self, center, symbol):
+        """Checks if a ring for the player with the given symbol ('B' or 'W') surrounds the given center. The center
+        of a ring must not hold the player's own stone. Returns True if ring is present, otherwise False."""
+
+        col, row = center
+        if not (1 < col < 18 and 1 < row < 18) or self._board[row][col] == symbol:
+            return False
+        return all(self._board[row + offset[1]][col + offset[0]] == symbol for offset in RING_OFFSETS)
 
     def ring_checker(self, stone_list):
         """Function for checking if player has a valid ring by iterating through a list of stones and checking if the
@@ -341,10 +652,12 @@ class GessGame:
         return False
 
     def restore_board(self, black_list, white_list):
-        """Restores game board from backup lists of stone locations. Used by make_move method and takes lists of stones
-         for the two players as parameters."""
+        """Restores game board from backup lists of stone locations. Takes lists of stones for the two players as
+         parameters."""
         self._board = [["-"] * 20 for _ in range(20)]
         self._black_stones, self._white_stones = [], []
+        self._rings = {"B": set(), "W": set()}
+        self._hash = ZOBRIST_SIDE if self._curr_player == "WHITE" else 0
         for stone in black_list:
             self.place_stone(stone, self._black_stones, "B")
         for stone in white_list:
@@ -353,3 +666,573 @@ class GessGame:
     def resign_game(self):
         """Function for current player to resign the game and give the opposing player the win. Takes no parameters."""
         self._game_state = self._opp_player + "_WON"
+
+    # Class an instrumented subclass times the methods of, or None for a plain class.
+    _PLAIN_CLASS = None
+
+    # Methods timed as phases of make_move while instrumentation is enabled.
+    INSTRUMENTED_PHASES = ("_select_piece", "check_dir_range", "collision_checker", "apply_move", "_capture_stones",
+                           "stone_mover", "_ring_updater", "undo_move")
+
+    def enable_instrumentation(self, stats=None):
+        """Starts counting and timing make_move and each method in INSTRUMENTED_PHASES, and recording the result of
+        every make_move. The game's class is switched to an instrumented subclass from instrumented_class, so games
+        without instrumentation run the plain methods with no added cost, and copies and pickles of the game time their
+        own moves. Takes an optional MoveStats to share between games as a parameter. Returns the MoveStats in use."""
+        self._instrumentation = stats if stats is not None else MoveStats()
+        self._instrumentation.add_phases(("make_move",) + self.INSTRUMENTED_PHASES)
+        self.__class__ = instrumented_class(self._PLAIN_CLASS or self.__class__)
+        return self._instrumentation
+
+    def disable_instrumentation(self):
+        """Stops instrumentation and switches the game back to its plain class. The collected MoveStats is kept and is
+        still returned by get_instrumentation. Takes no parameters."""
+        self.__class__ = self._PLAIN_CLASS or self.__class__
+
+    def get_instrumentation(self):
+        """Returns the MoveStats of the most recent enable_instrumentation, or None if it was never enabled."""
+        return self._instrumentation
+
+
+class MoveStats:
+    """Represents the counters and timings collected by GessGame.enable_instrumentation. Keeps the number of calls and
+    cumulative seconds of each phase, and the number of make_move results of each kind. Invalid selections and invalid
+    moves are counted by their REJECTION_REASONS code, and other results by their RESULT_CODES code. Phase timings
+    include the time of any phase called from inside them, such as stone_mover inside apply_move."""
+
+    def __init__(self):
+        """Initializes empty counters. Takes no parameters."""
+        self._calls, self._seconds, self._results = {}, {}, {}
+
+    def add_phases(self, phases):
+        """Adds phases with no calls yet, so every instrumented phase is reported even if it is never called."""
+        for phase in phases:
+            self._calls.setdefault(phase, 0)
+            self._seconds.setdefault(phase, 0.0)
+
+    def time_phase(self, phase, method, *args):
+        """Calls method with the given arguments and adds the call and its elapsed time to the given phase. Returns the
+        method's result."""
+        start_time = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._calls[phase] = self._calls.get(phase, 0) + 1
+            self._seconds[phase] = self._seconds.get(phase, 0.0) + perf_counter() - start_time
+
+    def record_result(self, game, start_center, end_center, result):
+        """Counts the code of a make_move result. Rejected selections and moves are counted by the reason given by the
+        game's invalid_move_reason."""
+        code = RESULT_CODES[result]
+        if code in ("INVALID_SELECTION", "INVALID_MOVE"):
+            code = game.invalid_move_reason(start_center, end_center) or code
+        self._results[code] = self._results.get(code, 0) + 1
+
+    def get_calls(self):
+        """Returns a dictionary of the number of calls to each phase."""
+        return dict(self._calls)
+
+    def get_seconds(self):
+        """Returns a dictionary of the cumulative seconds spent in each phase."""
+        return dict(self._seconds)
+
+    def get_results(self):
+        """Returns a dictionary of the number of make_move results with each code."""
+        return dict(self._results)
+
+    def reset(self):
+        """Sets every counter and timing back to zero, keeping the phases of games already instrumented."""
+        for phase in self._calls:
+            self._calls[phase], self._seconds[phase] = 0, 0.0
+        self._results.clear()
+
+    def report(self):
+        """Returns a text table of calls, total and mean time per phase, followed by the counts of each result."""
+        lines = ["{:<20}{:>10}{:>12}{:>12}".format("phase", "calls", "total ms", "mean us")]
+        for phase, calls in self._calls.items():
+            seconds = self._seconds[phase]
+            lines.append("{:<20}{:>10}{:>12.3f}{:>12.3f}".format(phase, calls, 1000 * seconds,
+                                                                 1000000 * seconds / calls if calls else 0.0))
+        lines += ["{:<20}{:>10}".format(code, count) for code, count in sorted(self._results.items())]
+        return "\n".join(lines)
+
+
+# Instrumented subclass of each game class, created by instrumented_class.
+_INSTRUMENTED_CLASSES = {}
+
+
+def instrumented_class(game_class):
+    """Returns the subclass of a game class used while instrumentation is enabled, creating it on first use. Its
+    make_move and every method in INSTRUMENTED_PHASES time the plain method with the game's MoveStats, or just call it
+    if the game has none. The subclasses of GessGame and BitboardGessGame are module attributes, so instrumented games
+    of either class can be pickled."""
+    if game_class in _INSTRUMENTED_CLASSES:
+        return _INSTRUMENTED_CLASSES[game_class]
+
+    def timed_phase(phase):
+        method = getattr(game_class, phase)
+
+        def timed(self, *args):
+            stats = self._instrumentation
+            if stats is None:
+                return method(self, *args)
+            return stats.time_phase(phase, method, self, *args)
+
+        timed.__name__, timed.__doc__ = phase, method.__doc__
+        return timed
+
+    def make_move(self, start_center, end_center):
+        stats = self._instrumentation
+        if stats is None:
+            return game_class.make_move(self, start_center, end_center)
+        result = stats.time_phase("make_move", game_class.make_move, self, start_center, end_center)
+        stats.record_result(self, start_center, end_center, result)
+        return result
+
+    make_move.__doc__ = game_class.make_move.__doc__
+    namespace = {phase: timed_phase(phase) for phase in game_class.INSTRUMENTED_PHASES}
+    namespace.update(make_move=make_move, _PLAIN_CLASS=game_class, __module__=game_class.__module__,
+                     __doc__="Instrumented " + game_class.__name__ + ". See GessGame.enable_instrumentation.")
+    subclass = _INSTRUMENTED_CLASSES[game_class] = type("Instrumented" + game_class.__name__, (game_class,), namespace)
+    return subclass
+
+
+InstrumentedGessGame = instrumented_class(GessGame)
+
+
+@contextmanager
+def profile_block(output=None, sort_key="cumulative", limit=25):
+    """Context manager that runs the enclosed block under cProfile, and writes a pstats report when the block exits.
+
+    :param output: File to write the report to, or None for standard output
+    :type output: file
+    :param sort_key: pstats key to sort the report by
+    :type sort_key: str
+    :param limit: Number of functions listed in the report
+    :type limit: int
+    """
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        pstats.Stats(profiler, stream=output or sys.stdout).sort_stats(sort_key).print_stats(limit)
+
+
+# Bitboard helpers. Each color is stored as a single 400-bit integer, with bit (row * 20 + col) set when a stone of
+# that color occupies the square at (col, row).
+def coord_to_bit(coord):
+    """Returns the single-bit mask for a (col, row) coordinate."""
+    return 1 << (coord[1] * 20 + coord[0])
+
+
+def stones_to_bits(stone_list):
+    """Converts a list of (col, row) coordinates to a bitboard. Takes the list of stones as a parameter."""
+    bits = 0
+    for stone in stone_list:
+        bits |= coord_to_bit(stone)
+    return bits
+
+
+def bits_to_stones(bits):
+    """Converts a bitboard to a list of (col, row) coordinates, ordered by row and then by column."""
+    stones = []
+    while bits:
+        low_bit = bits & -bits
+        index = low_bit.bit_length() - 1
+        stones.append((index % 20, index // 20))
+        bits ^= low_bit
+    return stones
+
+
+def _build_footprint_tables():
+    """Builds the footprint mask of every valid center, and the swept mask of every (center, direction) ray indexed by
+    move distance, from FOOTPRINTS and SWEEP_CELLS."""
+    footprint_masks = {center: stones_to_bits(footprint) for center, footprint in FOOTPRINTS.items()}
+    sweep_masks = {}
+    for key, (cells, ends) in SWEEP_CELLS.items():
+        # A move of each distance sweeps one more intermediate footprint than the distance before it.
+        (col, row), offsets = key[0], DIR_OFFSETS[key[1]]
+        masks = [0, 0]
+        for distance in range(2, len(ends)):
+            masks.append(masks[-1] | footprint_masks[(col + (distance - 1) * offsets[0],
+                                                      row + (distance - 1) * offsets[1])])
+        sweep_masks[key] = tuple(masks)
+    return footprint_masks, sweep_masks
+
+
+FOOTPRINT_MASKS, SWEEP_MASKS = _build_footprint_tables()
+
+
+def bits_pattern(bits, center):
+    """Extracts the 9-bit Piece pattern, numbered as in PATTERN_BITS, of the footprint around a valid center. Takes a
+    bitboard and the center as parameters."""
+    window = bits >> (center[1] * 20 + center[0] - 21)
+    return (window & 7) | (window >> 17 & 56) | (window >> 34 & 448)
+
+# Squares that can hold a stone. Stones moved onto the outer edge of the board are removed.
+INTERIOR_MASK = stones_to_bits([(col, row) for col in range(1, 19) for row in range(1, 19)])
+
+# Squares that can be the center of a ring, and the bit offsets of the eight stones surrounding a ring center.
+RING_CENTER_MASK = stones_to_bits([(col, row) for col in range(2, 18) for row in range(2, 18)])
+RING_BIT_OFFSETS = (-21, -20, -19, -1, 1, 19, 20, 21)
+
+
+# Squares within two king steps of each valid center. A ring centered outside this area is untouched by a Piece
+# lifted from or placed at that center.
+RING_NEAR_MASKS = {center: stones_to_bits([(col, row) for col in range(center[0] - 2, center[0] + 3)
+                                           for row in range(center[1] - 2, center[1] + 3)
+                                           if 0 <= col < 20 and 0 <= row < 20]) for center in FOOTPRINT_MASKS}
+
+
+def bits_zobrist(bits, symbol):
+    """Returns the XOR of the Zobrist keys for every stone in a bitboard. Takes a bitboard and the symbol ('B' or 'W')
+    of its stones as parameters."""
+    position_hash = 0
+    keys = ZOBRIST_KEYS[symbol]
+    while bits:
+        low_bit = bits & -bits
+        position_hash ^= keys[low_bit.bit_length() - 1]
+        bits ^= low_bit
+    return position_hash
+
+
+def bits_ring_centers(bits):
+    """Returns a bitboard of the centers of every ring in a bitboard. Shifts the bitboard so that every surrounding
+    stone of a ring lines up with the ring center, and keeps the empty (or opposing) centers that are fully
+    surrounded. Takes a bitboard as a parameter."""
+    ring_centers = RING_CENTER_MASK & ~bits
+    for offset in RING_BIT_OFFSETS:
+        ring_centers &= bits >> offset if offset > 0 else bits << -offset
+    return ring_centers
+
+
+def bits_have_ring(bits):
+    """Bitboard equivalent of GessGame.ring_checker. Takes a bitboard as a parameter. Returns True if ring is present,
+    otherwise False."""
+    return bits_ring_centers(bits) != 0
+
+
+class Position:
+    """Represents an immutable snapshot of a game: both bitboards, the current player and the game state, stored as the
+    102 bytes packed by GessGame.to_bytes. Positions are hashable and compare equal when they hold the same position,
+    so they can be used as dictionary keys and set members. A Position pickles as its bytes, and forks into a new game
+    with to_game.
+
+    :param data: Position packed by GessGame.to_bytes
+    :type data: bytes
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        """Initializes Position from packed bytes. Raises ValueError if data is not 102 bytes long."""
+        if len(data) != 102:
+            raise ValueError("A packed position is 102 bytes")
+        self._data = bytes(data)
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self._data == other._data
+
+    def __hash__(self):
+        return hash(self._data)
+
+    def __reduce__(self):
+        return Position, (self._data,)
+
+    def __repr__(self):
+        return "Position({} to move, {}, {} black and {} white stones)".format(
+            self.get_curr_player(), self.get_game_state(), bin(self.get_bits("B")).count("1"),
+            bin(self.get_bits("W")).count("1"))
+
+    def to_bytes(self):
+        """Returns the position packed as by GessGame.to_bytes."""
+        return self._data
+
+    def get_bits(self, symbol):
+        """Returns the bitboard for the player with the given symbol ('B' or 'W')."""
+        return int.from_bytes(self._data[:50] if symbol == "B" else self._data[50:100], "little")
+
+    def get_curr_player(self):
+        """Returns the player to move, "BLACK" or "WHITE"."""
+        return "WHITE" if self._data[100] else "BLACK"
+
+    def get_game_state(self):
+        """Returns the game state, such as "UNFINISHED"."""
+        return GAME_STATES[self._data[101]]
+
+    def get_hash(self):
+        """Returns the 64-bit Zobrist hash of the position, matching GessGame.get_hash."""
+        return bits_zobrist(self.get_bits("B"), "B") ^ bits_zobrist(self.get_bits("W"), "W") ^ \
+            (ZOBRIST_SIDE if self._data[100] else 0)
+
+    def to_game(self, game_class=GessGame):
+        """Forks the position into a new game of the given class, such as GessGame or BitboardGessGame, with an empty
+        undo stack."""
+        return game_class.from_bytes(self._data)
+
+
+class BitboardGessGame(GessGame):
+    """Represents a game of Gess backed by one bitboard per color instead of the nested list board and stone lists.
+    Offers the same methods as GessGame, with footprint, collision, capture, and ring checks done as mask operations.
+    Stone lists and the printed board are derived from the bitboards when requested."""
+
+    # Methods timed as phases of make_move while instrumentation is enabled. Selection and collision checks are single
+    # mask operations inside make_move, so they are timed as part of make_move.
+    INSTRUMENTED_PHASES = ("pattern_dir_range", "apply_move", "undo_move")
+
+    def __init__(self):
+        """Initializes Game Board from the GessGame starting position, then converts both sides to bitboards. Takes no
+        parameters."""
+        super().__init__()
+        self._bits = {"B": stones_to_bits(self._black_stones), "W": stones_to_bits(self._white_stones)}
+        del self._board, self._black_stones, self._white_stones, self._rings
+
+    def get_black_stones(self):
+        """Returns list of black stones, derived from the black bitboard. Takes no parameters."""
+        return bits_to_stones(self._bits["B"])
+
+    def get_white_stones(self):
+        """Returns list of white stones, derived from the white bitboard. Takes no parameters."""
+        return bits_to_stones(self._bits["W"])
+
+    def get_ring_count(self, symbol):
+        """Returns the number of complete rings for the player with the given symbol ('B' or 'W')."""
+        return bin(bits_ring_centers(self._bits[symbol])).count("1")
+
+    def ring_at(self, center, symbol):
+        """Checks if a ring for the player with the given symbol ('B' or 'W') surrounds the given center, with the same
+        rule as GessGame.ring_at. Returns True if ring is present, otherwise False."""
+        if not (1 < center[0] < 18 and 1 < center[1] < 18):
+            return False
+        return bits_ring_centers(self._bits[symbol]) & coord_to_bit(center) != 0
+
+    def get_stone_count(self, symbol):
+        """Returns the number of stones for the player with the given symbol ('B' or 'W')."""
+        return bin(self._bits[symbol]).count("1")
+
+    def get_bits(self, symbol):
+        """Returns the bitboard for the player with the given symbol ('B' or 'W')."""
+        return self._bits[symbol]
+
+    def player_stone_selector(self):
+        """Returns lists of stones for the current player and opposing player as a tuple. Takes no parameters."""
+        curr_player_stones = bits_to_stones(self._bits[self._curr_player[0]])
+        opp_player_stones = bits_to_stones(self._bits[self._opp_player[0]])
+        return curr_player_stones, opp_player_stones
+
+    def print_board(self):
+        """Function for printing game board. Used for debugging. Takes no parameters. Prints board."""
+        for i in range(19, -1, -1):
+            row = []
+            for j in range(20):
+                bit = coord_to_bit((j, i))
+                row.append("B" if self._bits["B"] & bit else "W" if self._bits["W"] & bit else "-")
+            print(row)
+        print("")
+
+    def make_move(self, start_center, end_center):
+        """Function for making a move. Follows the same rules and returns the same results as GessGame.make_move, but
+        validates the move with bitboard operations before applying it with apply_move. Takes starting and ending
+        coordinates of move as parameters. Returns True if move is successful, otherwise returns a message describing
+        why the move is invalid."""
+
+        # Checks if game is already over.
+        if self._game_state != "UNFINISHED":
+            return "Game is over!"
+
+        # Checks if starting and ending locations are valid. Footprint masks only exist for valid centers.
+        start_mask, end_mask = FOOTPRINT_MASKS.get(start_center), FOOTPRINT_MASKS.get(end_center)
+        if start_mask is None or end_mask is None:
+            return "Invalid selection - try again!"
+
+        # Checking starting footprint for any of opponent's stones. Also will prevent moving out of turn.
+        curr_sym, opp_sym = self._curr_player[0], self._opp_player[0]
+        curr_bits, opp_bits = self._bits[curr_sym], self._bits[opp_sym]
+        if start_mask & opp_bits:
+            return "Invalid selection - try again!"
+
+        # Getting stones contained in Piece and checking if move is allowed based on direction and range.
+        contained = curr_bits & start_mask
+        move_dir_range = self.pattern_dir_range(start_center, end_center, bits_pattern(contained, start_center))
+        if not move_dir_range:
+            return "Invalid move - try again!"
+        move_dir, move_range = move_dir_range
+
+        # Collision checking against every stone that isn't moving, with the swept mask of the move.
+        stationary = (curr_bits & ~contained) | opp_bits
+        if SWEEP_MASKS[(start_center, move_dir)][move_range] & stationary:
+            return "Other stones in the way of move - try again!"
+
+        # Applies the move. apply_move leaves the board untouched if the move loses the current player's last ring.
+        if not self.apply_move(start_center, end_center):
+            return "Move leaves you without a ring - try again!"
+        return True
+
+    def apply_move(self, start_center, end_center):
+        """Function for applying a move that has already passed the checks in make_move, such as a move yielded by
+        legal_moves. The new bitboards are only committed once the move is known to keep the current player's ring,
+        so rejected moves never need to be rolled back. Bitboards are immutable integers, so the undo stack saves the
+        previous bitboards directly. Takes starting and ending coordinates of move as parameters. Returns True if move
+        is applied, otherwise False."""
+
+        curr_sym, opp_sym = self._curr_player[0], self._opp_player[0]
+        curr_bits, opp_bits = self._bits[curr_sym], self._bits[opp_sym]
+        contained = curr_bits & FOOTPRINT_MASKS[start_center]
+        end_mask = FOOTPRINT_MASKS[end_center]
+
+        # Lifting the Piece, clearing the ending footprint, and placing the Piece's stones at the new location.
+        # Stones that land on the edge of the board are dropped by the interior mask.
+        shift = (end_center[1] - start_center[1]) * 20 + end_center[0] - start_center[0]
+        moved = contained << shift if shift > 0 else contained >> -shift
+        new_curr_bits = (curr_bits & ~contained & ~end_mask) | (moved & INTERIOR_MASK)
+        new_opp_bits = opp_bits & ~end_mask
+
+        # If move results in current player losing their last ring, leaves board untouched.
+        if not bits_have_ring(new_curr_bits):
+            return False
+        self._undo_stack.append((self._bits["B"], self._bits["W"], self._hash, self._curr_player, self._game_state))
+        self._bits[curr_sym], self._bits[opp_sym] = new_curr_bits, new_opp_bits
+        self._hash ^= bits_zobrist(curr_bits ^ new_curr_bits, curr_sym) ^ bits_zobrist(opp_bits ^ new_opp_bits, opp_sym)
+
+        # If move results in opponent losing their last ring, changes game state to reflect win.
+        if not bits_have_ring(new_opp_bits):
+            self._game_state = self._curr_player + "_WON"
+            return True
+
+        # Move is successful. Switches players for next move.
+        self._curr_player, self._opp_player = self._opp_player, self._curr_player
+        self._hash ^= ZOBRIST_SIDE
+        return True
+
+    def undo_move(self):
+        """Reverses the most recent move made with make_move or apply_move by restoring the bitboards, hash, game state
+        and current player saved on the undo stack. Takes no parameters. Returns True if a move was undone, or False if
+        there are no moves to undo."""
+
+        if not self._undo_stack:
+            return False
+        black_bits, white_bits, self._hash, curr_player, game_state = self._undo_stack.pop()
+        self._bits["B"], self._bits["W"] = black_bits, white_bits
+        self._curr_player, self._game_state = curr_player, game_state
+        self._opp_player = "WHITE" if curr_player == "BLACK" else "BLACK"
+        return True
+
+    def legal_moves(self):
+        """Generator that yields every legal move for the current player as a (start_center, end_center) tuple, in the
+        same order as GessGame.legal_moves. Each direction of a Piece is swept once with footprint masks, stopping at
+        the first footprint that contains a stationary stone. Takes no parameters and does not change the game."""
+
+        # No moves are available once the game is over.
+        if self._game_state != "UNFINISHED":
+            return
+
+        curr_bits, opp_bits = self._bits[self._curr_player[0]], self._bits[self._opp_player[0]]
+        curr_rings = bits_ring_centers(curr_bits)
+        for start_center in ((col, row) for col in range(1, 19) for row in range(1, 19)):
+
+            # Skipping selections containing any of opponent's stones, and Pieces that cannot move.
+            start_mask = FOOTPRINT_MASKS[start_center]
+            contained = curr_bits & start_mask
+            if not contained or start_mask & opp_bits:
+                continue
+            valid_dirs, move_range = PIECE_MOVES[bits_pattern(contained, start_center)]
+            if not move_range:
+                continue
+
+            curr_stationary = curr_bits & ~contained
+            stationary = curr_stationary | opp_bits
+
+            # Rings more than two squares from both centers are untouched by the move, so only moves that come near
+            # every remaining ring need the full ring check.
+            far_rings = curr_rings & ~RING_NEAR_MASKS[start_center]
+            for move_dir in MOVE_DIRECTIONS:
+                if move_dir not in valid_dirs:
+                    continue
+                offsets = DIR_OFFSETS[move_dir]
+                for distance in range(1, move_range + 1):
+                    end_center = (start_center[0] + distance * offsets[0], start_center[1] + distance * offsets[1])
+                    end_mask = FOOTPRINT_MASKS.get(end_center)
+                    if end_mask is None:
+                        break
+                    shift = (end_center[1] - start_center[1]) * 20 + end_center[0] - start_center[0]
+                    moved = contained << shift if shift > 0 else contained >> -shift
+                    if far_rings & ~RING_NEAR_MASKS[end_center] or \
+                            bits_have_ring((curr_stationary & ~end_mask) | (moved & INTERIOR_MASK)):
+                        yield start_center, end_center
+
+                    # Footprint becomes an intermediate step for longer moves, so any stationary stone blocks the ray.
+                    if end_mask & stationary:
+                        break
+
+    def place_stone(self, coord, stone_list, symbol):
+        """Places stone on the bitboard for the given symbol ('B' or 'W') and appends to the given list of stones."""
+        self._bits[symbol] |= coord_to_bit(coord)
+        stone_list.append(coord)
+        self._hash ^= ZOBRIST_KEYS[symbol][coord[1] * 20 + coord[0]]
+
+    def remove_stone(self, coord, stone_list):
+        """Removes stone from both bitboards and removes it from the given list of stones."""
+        bit = coord_to_bit(coord)
+        for symbol in self._bits:
+            if self._bits[symbol] & bit:
+                self._bits[symbol] ^= bit
+                self._hash ^= ZOBRIST_KEYS[symbol][coord[1] * 20 + coord[0]]
+        stone_list.remove(coord)
+
+    def load_bits(self, black_bits, white_bits):
+        """Replaces both bitboards and recomputes the hash. Takes the black and white bitboards as parameters."""
+        self._bits = {"B": black_bits, "W": white_bits}
+        self._hash = bits_zobrist(black_bits, "B") ^ bits_zobrist(white_bits, "W") ^ \
+            (ZOBRIST_SIDE if self._curr_player == "WHITE" else 0)
+
+    def restore_board(self, black_list, white_list):
+        """Restores bitboards from backup lists of stone locations. Takes lists of stones for the two players as
+        parameters."""
+        self._bits = {"B": stones_to_bits(black_list), "W": stones_to_bits(white_list)}
+        self._hash = zobrist_hash(black_list, white_list, self._curr_player)
+
+
+InstrumentedBitboardGessGame = instrumented_class(BitboardGessGame)
+
+
+def main():
+    """Plays a game of Gess in the terminal without PyGame. Reads one move per line from standard input, written as
+    two letter-number coordinates such as "c3 c6" or "c3-c6", so games can also be scripted by piping moves in. The
+    command "undo" takes back the last move, "resign" resigns for the current player and "quit" exits."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Play Gess in the terminal.")
+    parser.add_argument("--bitboard", action="store_true", help="use the bitboard backend")
+    parser.add_argument("--quiet", action="store_true", help="print move results only, not the board")
+    args = parser.parse_args()
+
+    game = BitboardGessGame() if args.bitboard else GessGame()
+    while game.get_game_state() == "UNFINISHED":
+        if not args.quiet:
+            game.print_board()
+        print(game.get_curr_player() + " to move: ", end="", flush=True)
+        line = sys.stdin.readline()
+        if not line or line.strip() == "quit":
+            print("")
+            break
+        command = line.strip().lower()
+        if command == "undo":
+            print("Move undone" if game.undo_move() else "No moves to undo")
+        elif command == "resign":
+            game.resign_game()
+        else:
+            try:
+                start_text, end_text = command.replace("-", " ").split()
+                result = game.make_move(game.coord_converter(start_text), game.coord_converter(end_text))
+            except ValueError:
+                result = "Enter a move such as c3 c6"
+            print(start_text + "-" + end_text if result is True else result)
+    print(game.get_game_state())
+
+
+if __name__ == "__main__":
+    main()
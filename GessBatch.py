@@ -0,0 +1,217 @@
+# Description: Vectorized Gess environment that steps many games at once with NumPy.
+
+import numpy as np
+
+from GessBackend import GessGame, GAME_STATES
+
+# Result codes returned by BatchGessGame.step, and the matching make_move results.
+MOVE_OK, GAME_OVER, INVALID_SELECTION, INVALID_MOVE, BLOCKED, RING_LOSS = range(6)
+RESULT_MESSAGES = (True, "Game is over!", "Invalid selection - try again!", "Invalid move - try again!",
+                   "Other stones in the way of move - try again!", "Move leaves you without a ring - try again!")
+
+# Stone values on the board arrays. The current player of each game is stored with the same values.
+EMPTY, BLACK, WHITE = 0, 1, -1
+
+# Row and column offsets of a 3x3 footprint, laid out as [row offset + 1, col offset + 1].
+_FOOTPRINT_ROWS, _FOOTPRINT_COLS = np.mgrid[-1:2, -1:2]
+
+
+class BatchGessGame:
+    """Represents N games of Gess stored as a (N, 20, 20) int8 array, indexed [game, row, col] like GessGame's board.
+    Black stones are 1, white stones are -1 and empty squares are 0. Includes a step method that validates and applies
+    one move per game with array operations over the whole batch, following the same rules as GessGame.make_move.
+
+    :param num_games: Number of games, each starting from the standard opening
+    :type num_games: int
+    """
+
+    def __init__(self, num_games):
+        """Initializes every game to the GessGame starting position with black to move."""
+        start = self.position_to_array(GessGame().to_bytes())
+        self._boards = np.repeat(start[np.newaxis], num_games, axis=0)
+        self._curr_player = np.full(num_games, BLACK, dtype=np.int8)
+        self._game_state = np.zeros(num_games, dtype=np.int8)
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Creates a batch from a list of positions packed by GessGame.to_bytes."""
+        batch = cls(0)
+        batch._boards = np.stack([cls.position_to_array(position) for position in positions]).astype(np.int8)
+        batch._curr_player = np.array([WHITE if position[100] else BLACK for position in positions], dtype=np.int8)
+        batch._game_state = np.array([position[101] for position in positions], dtype=np.int8)
+        return batch
+
+    @staticmethod
+    def position_to_array(position):
+        """Converts a position packed by GessGame.to_bytes to a (20, 20) int8 board array."""
+        black = np.unpackbits(np.frombuffer(position[:50], dtype=np.uint8), bitorder="little").reshape(20, 20)
+        white = np.unpackbits(np.frombuffer(position[50:100], dtype=np.uint8), bitorder="little").reshape(20, 20)
+        return black.astype(np.int8) - white.astype(np.int8)
+
+    def get_position(self, index):
+        """Packs a single game of the batch in the GessGame.to_bytes format, so it can be loaded with
+        GessGame.from_bytes."""
+        board = self._boards[index]
+        black = np.packbits(board.reshape(400) == BLACK, bitorder="little").tobytes()
+        white = np.packbits(board.reshape(400) == WHITE, bitorder="little").tobytes()
+        return black + white + bytes((int(self._curr_player[index] == WHITE), int(self._game_state[index])))
+
+    def __len__(self):
+        """Returns the number of games in the batch."""
+        return len(self._boards)
+
+    def get_boards(self):
+        """Returns the (N, 20, 20) board array. The array is shared with the batch, not copied."""
+        return self._boards
+
+    def get_curr_players(self):
+        """Returns an (N,) array of the player to move in each game, as BLACK (1) or WHITE (-1)."""
+        return self._curr_player
+
+    def get_game_states(self):
+        """Returns an (N,) array of game states, numbered as in GessBackend.GAME_STATES."""
+        return self._game_state
+
+    def get_game_state_names(self):
+        """Returns a list of game state strings, such as "UNFINISHED", one per game."""
+        return [GAME_STATES[state] for state in self._game_state]
+
+    def step(self, starts, ends):
+        """Attempts one move in every game. Moves are checked in the same order as GessGame.make_move and only legal
+        moves change their game. A game can be skipped by giving it an off-board start such as (-1, -1).
+
+        :param starts: (N, 2) array of (col, row) starting centers
+        :type starts: numpy.ndarray
+        :param ends: (N, 2) array of (col, row) ending centers
+        :type ends: numpy.ndarray
+        :return: (N,) array of result codes. RESULT_MESSAGES gives the matching make_move result for each code.
+        :rtype: numpy.ndarray
+        """
+
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        num_games = len(self._boards)
+        games = np.arange(num_games)
+        curr = self._curr_player
+        result = np.full(num_games, MOVE_OK, dtype=np.int8)
+        pending = self._game_state == 0
+        result[~pending] = GAME_OVER
+
+        # Checks if starting and ending locations are valid. Invalid centers are clamped so they can still be indexed.
+        in_bounds = np.all((starts > 0) & (starts < 19) & (ends > 0) & (ends < 19), axis=1)
+        result[pending & ~in_bounds] = INVALID_SELECTION
+        pending &= in_bounds
+        start_col, start_row = np.clip(starts[:, 0], 1, 18), np.clip(starts[:, 1], 1, 18)
+        end_col, end_row = np.clip(ends[:, 0], 1, 18), np.clip(ends[:, 1], 1, 18)
+
+        # Extracting starting footprints and checking them for any of opponent's stones.
+        start_rows = start_row[:, None, None] + _FOOTPRINT_ROWS
+        start_cols = start_col[:, None, None] + _FOOTPRINT_COLS
+        window = self._boards[games[:, None, None], start_rows, start_cols]
+        own = window == curr[:, None, None]
+        opp_in_sel = np.any(window == -curr[:, None, None], axis=(1, 2))
+        result[pending & opp_in_sel] = INVALID_SELECTION
+        pending &= ~opp_in_sel
+
+        # Checking direction and range. A direction is allowed when the Piece has a stone on that side, and a Piece
+        # without a center stone moves at most 3 squares.
+        col_delta, row_delta = end_col - start_col, end_row - start_row
+        distance = np.maximum(np.abs(col_delta), np.abs(row_delta))
+        straight = (col_delta == 0) | (row_delta == 0) | (np.abs(col_delta) == np.abs(row_delta))
+        col_step, row_step = np.sign(col_delta), np.sign(row_delta)
+        dir_allowed = own[games, row_step + 1, col_step + 1] & ((col_step != 0) | (row_step != 0))
+        in_range = own[:, 1, 1] | (distance <= 3)
+        valid_move = straight & dir_allowed & in_range
+        result[pending & ~valid_move] = INVALID_MOVE
+        pending &= valid_move
+
+        # Collision checking. Gathers the footprint of each intermediate center for the games still moving that far,
+        # ignoring the moving Piece's own stones.
+        blocked = np.zeros(num_games, dtype=bool)
+        for i in range(1, 17):
+            active = np.flatnonzero(pending & (i < distance))
+            if len(active) == 0:
+                break
+            step_rows = (start_row[active] + i * row_step[active])[:, None, None] + _FOOTPRINT_ROWS
+            step_cols = (start_col[active] + i * col_step[active])[:, None, None] + _FOOTPRINT_COLS
+            cells = self._boards[active[:, None, None], step_rows, step_cols]
+            in_piece = (np.abs(step_rows - start_row[active][:, None, None]) <= 1) & \
+                (np.abs(step_cols - start_col[active][:, None, None]) <= 1) & (cells == curr[active][:, None, None])
+            blocked[active] |= np.any((cells != EMPTY) & ~in_piece, axis=(1, 2))
+        result[pending & blocked] = BLOCKED
+        pending &= ~blocked
+
+        # Applying the moves on a copy of the boards still pending. Clears the Piece and the ending footprint, then
+        # places the Piece's stones on the interior squares of the ending footprint.
+        moving = np.flatnonzero(pending)
+        if len(moving) == 0:
+            return result
+        boards = self._boards[moving].copy()
+        local = np.arange(len(moving))[:, None, None]
+        piece, player = own[moving], curr[moving][:, None, None]
+        boards[local, start_rows[moving], start_cols[moving]] = np.where(piece, EMPTY, window[moving])
+        end_rows = end_row[moving][:, None, None] + _FOOTPRINT_ROWS
+        end_cols = end_col[moving][:, None, None] + _FOOTPRINT_COLS
+        interior = (end_rows > 0) & (end_rows < 19) & (end_cols > 0) & (end_cols < 19)
+        boards[local, end_rows, end_cols] = np.where(piece & interior, player, EMPTY)
+
+        # Rejecting moves that leave the current player without a ring, and committing the rest.
+        keeps_ring = self.has_ring(boards, curr[moving])
+        result[moving[~keeps_ring]] = RING_LOSS
+        moved = moving[keeps_ring]
+        self._boards[moved] = boards[keeps_ring]
+
+        # Ending games where the opponent lost their last ring, and switching players in the others.
+        opp_has_ring = self.has_ring(boards[keeps_ring], -curr[moved])
+        winners = moved[~opp_has_ring]
+        self._game_state[winners] = np.where(curr[winners] == BLACK, 1, 2)
+        self._curr_player[moved[opp_has_ring]] *= -1
+        return result
+
+    @staticmethod
+    def ring_centers(boards, players):
+        """Finds rings with the same rule as GessGame.ring_checker: all eight squares around a center hold the
+        player's stones, and the center does not. Takes a (N, 20, 20) board array and an (N,) array of players as
+        parameters. Returns a (N, 16, 16) bool array for the centers at rows and columns 2 to 17."""
+        own = boards == players[:, None, None]
+        rings = ~own[:, 2:18, 2:18]
+        for row_offset, col_offset in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)):
+            rings &= own[:, 2 + row_offset:18 + row_offset, 2 + col_offset:18 + col_offset]
+        return rings
+
+    @classmethod
+    def has_ring(cls, boards, players):
+        """Returns an (N,) bool array that is True for each board where the given player has a ring."""
+        return np.any(cls.ring_centers(boards, players), axis=(1, 2))
+
+    def random_candidates(self, rng):
+        """Proposes one random move per game, usually starting next to one of the current player's stones. Proposals
+        are not checked, so step may reject them. Takes a numpy.random.Generator as a parameter and returns (starts,
+        ends) arrays for step."""
+
+        num_games = len(self._boards)
+
+        # Sampling 16 random interior squares per game and keeping the first that holds one of the current player's
+        # stones, or the first sample if none do.
+        samples = rng.integers(1, 19, (num_games, 16, 2))
+        sampled = self._boards[np.arange(num_games)[:, None], samples[:, :, 1], samples[:, :, 0]]
+        first_own = np.argmax(sampled == self._curr_player[:, None], axis=1)
+        starts = samples[np.arange(num_games), first_own] + rng.integers(-1, 2, (num_games, 2))
+
+        # Moving in a random direction, mostly over short distances.
+        steps = np.array([[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]])
+        directions = steps[rng.integers(0, 8, num_games)]
+        distances = np.where(rng.random(num_games) < 0.8, rng.integers(1, 4, num_games),
+                             rng.integers(1, 18, num_games))
+        return starts, starts + directions * distances[:, None]
+
+    def play_random(self, max_steps, rng=None):
+        """Plays random moves in every unfinished game for up to max_steps steps. Each step proposes a move per game
+        with random_candidates, so games whose proposal is rejected simply try again on the next step. Takes the
+        number of steps and an optional numpy.random.Generator as parameters. Returns the number of moves made."""
+        rng = rng if rng is not None else np.random.default_rng()
+        moves_made = 0
+        for _ in range(max_steps):
+            if not np.any(self._game_state == 0):
+                break
+            moves_made += int(np.count_nonzero(self.step(*self.random_candidates(rng)) == MOVE_OK))
+        return moves_made
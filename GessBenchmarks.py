@@ -0,0 +1,310 @@
+# Description: Benchmark and perft suite for the Gess rules engine. Prints machine-readable JSON results.
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+
+from GessBackend import GessGame, BitboardGessGame, Selection, bits_have_ring
+
+# Number of move sequences of each length from the starting position, counted by perft. A game that is won before
+# the last ply ends its sequence early and is not counted. Any board representation must reproduce these counts.
+PERFT_EXPECTED = {1: 319, 2: 101761, 3: 31552410}
+
+BACKENDS = {"list": GessGame, "bitboard": BitboardGessGame}
+
+# make_move results timed by the benchmark, keyed by the name used in the JSON output.
+MOVE_RESULTS = {"legal": True,
+                "invalid_selection": "Invalid selection - try again!",
+                "invalid_move": "Invalid move - try again!",
+                "blocked": "Other stones in the way of move - try again!",
+                "ring_loss": "Move leaves you without a ring - try again!"}
+
+
+def perft(game, depth):
+    """Counts the move sequences of the given length from a game's position, using legal_moves, apply_move and
+    undo_move. The game is left unchanged. Takes the game and depth as parameters and returns the count."""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in game.legal_moves())
+    count = 0
+    for move in list(game.legal_moves()):
+        game.apply_move(*move)
+        if game.get_game_state() == "UNFINISHED":
+            count += perft(game, depth - 1)
+        game.undo_move()
+    return count
+
+
+def time_call(func, min_seconds=0.2):
+    """Times a function that takes no parameters. Runs it in rounds of at least min_seconds and returns the best
+    round's seconds per call."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def find_sample_moves(seed=0):
+    """Finds one attempted move for each make_move result, by playing seeded random games and trying random moves.
+    Returns a dictionary mapping each name in MOVE_RESULTS to a position packed by to_bytes and a move tried from it."""
+    rng = random.Random(seed)
+    samples = {}
+    game = BitboardGessGame()
+    while len(samples) < len(MOVE_RESULTS):
+        if game.get_game_state() != "UNFINISHED":
+            game = BitboardGessGame()
+        position = game.to_bytes()
+        for _ in range(200):
+            start = (rng.randint(0, 19), rng.randint(0, 19))
+            end = (start[0] + rng.randint(-4, 4), start[1] + rng.randint(-4, 4))
+            result = game.make_move(start, end)
+            if result is True:
+                game.undo_move()
+            for name, expected in MOVE_RESULTS.items():
+                if name not in samples and result == expected:
+                    samples[name] = (position, (start, end))
+        legal_moves = list(game.legal_moves())
+        if legal_moves:
+            game.apply_move(*rng.choice(legal_moves))
+        else:
+            game = BitboardGessGame()
+    return samples
+
+
+def bench_make_move(samples):
+    """Times make_move for each kind of result on both backends. Legal moves are undone after each call."""
+    timings = {}
+    for backend, game_class in BACKENDS.items():
+        for name, (position, move) in samples.items():
+            game = game_class.from_bytes(position)
+
+            def attempt():
+                if game.make_move(*move) is True:
+                    game.undo_move()
+
+            timings[backend + ".make_move." + name] = time_call(attempt)
+    return timings
+
+
+def bench_helpers():
+    """Times ring_checker, collision_checker and legal_moves on the starting position."""
+    game, bitboard_game = GessGame(), BitboardGessGame()
+    black_stones = game.get_black_stones()
+    stationary = set(black_stones + game.get_white_stones()) - set(Selection((10, 2)).footprint())
+    black_bits = bitboard_game.get_bits("B")
+    return {"list.ring_checker": time_call(lambda: game.ring_checker(black_stones)),
+            "bitboard.bits_have_ring": time_call(lambda: bits_have_ring(black_bits)),
+            "list.collision_checker": time_call(lambda: game.collision_checker((10, 2), "U", 15, stationary)),
+            "list.legal_moves": time_call(lambda: sum(1 for _ in game.legal_moves())),
+            "bitboard.legal_moves": time_call(lambda: sum(1 for _ in bitboard_game.legal_moves()))}
+
+
+def bench_playouts(num_games, max_moves, seed=0):
+    """Plays seeded random playouts from the starting position on both backends. Returns games and moves per second
+    for each backend."""
+    results = {}
+    for backend, game_class in BACKENDS.items():
+        rng = random.Random(seed)
+        moves = 0
+        start_time = time.perf_counter()
+        for _ in range(num_games):
+            game = game_class()
+            for _ in range(max_moves):
+                legal_moves = list(game.legal_moves())
+                if not legal_moves:
+                    break
+                game.make_move(*rng.choice(legal_moves))
+                moves += 1
+        seconds = time.perf_counter() - start_time
+        results[backend + ".playout.games_per_second"] = num_games / seconds
+        results[backend + ".playout.moves_per_second"] = moves / seconds
+    return results
+
+
+def bench_batch(num_games, num_steps, seed=0):
+    """Times random playout steps with GessBatch.BatchGessGame. Returns an empty dictionary if NumPy is not
+    installed."""
+    try:
+        import numpy as np
+        from GessBatch import BatchGessGame
+    except ImportError:
+        return {}
+    batch = BatchGessGame(num_games)
+    start_time = time.perf_counter()
+    moves = batch.play_random(num_steps, np.random.default_rng(seed))
+    seconds = time.perf_counter() - start_time
+    return {"batch.steps_per_second": num_games * num_steps / seconds, "batch.moves_per_second": moves / seconds}
+
+
+def random_attempt(game, rng):
+    """Proposes a move for verify_backends. Most start next to one of the current player's stones and move a short way
+    in one of the eight directions. The rest are any two squares, including squares just off the board. Returns the
+    (start, end) pair, which may be illegal."""
+    stones = game.get_black_stones() if game.get_curr_player() == "BLACK" else game.get_white_stones()
+    if not stones or rng.random() < 0.1:
+        return (rng.randint(-1, 20), rng.randint(-1, 20)), (rng.randint(-1, 20), rng.randint(-1, 20))
+    stone = rng.choice(stones)
+    start = (stone[0] + rng.randint(-1, 1), stone[1] + rng.randint(-1, 1))
+    col_step, row_step = rng.choice([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+    distance = rng.randint(1, 6) if rng.random() < 0.8 else rng.randint(1, 18)
+    return start, (start[0] + col_step * distance, start[1] + row_step * distance)
+
+
+def verify_backends(num_games, max_moves, attempts_per_move=10, seed=0):
+    """Plays seeded random games on every backend side by side and checks that they agree, so a change to one board
+    representation can't drift from the others. At each position, random moves are attempted with make_move, and each
+    one must give the same result and the same to_bytes position on every backend. Legal attempts are undone, so each
+    attempt starts from the same position. The legal_moves of the list and bitboard backends must match, and a move
+    must be accepted by make_move exactly when legal_moves lists it. GessBatch.BatchGessGame is checked too, through
+    step, if NumPy is installed. A random legal move is then played to reach the next position.
+
+    :param num_games: Number of games to play
+    :type num_games: int
+    :param max_moves: Moves after which an unfinished game is stopped
+    :type max_moves: int
+    :param attempts_per_move: Random moves attempted at each position
+    :type attempts_per_move: int
+    :param seed: Seed for the games and attempted moves
+    :type seed: int
+    :return: Backends checked, number of attempts and positions, count of each make_move result, and the first
+        mismatch found, or None
+    :rtype: dict
+    """
+
+    try:
+        from GessBatch import BatchGessGame, RESULT_MESSAGES
+    except ImportError:
+        BatchGessGame = None
+    rng = random.Random(seed)
+    results = {"backends": sorted(BACKENDS) + (["batch"] if BatchGessGame is not None else []), "attempts": 0,
+               "positions": 0, "results": {}, "mismatch": None}
+
+    def record(description, actual, expected):
+        results["mismatch"] = {"game": game_index, "moves": moves, "check": description, "actual": repr(actual),
+                               "expected": repr(expected)}
+
+    def check(description, actual, expected):
+        if actual != expected:
+            record(description, actual, expected)
+        return actual == expected
+
+    for game_index in range(num_games):
+        games = {backend: game_class() for backend, game_class in BACKENDS.items()}
+        batch = BatchGessGame(1) if BatchGessGame is not None else None
+        reference = games["bitboard"]
+        moves = []
+        while reference.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+            results["positions"] += 1
+            legal_moves = list(reference.legal_moves())
+            legal_set = set(legal_moves)
+
+            # legal_moves must yield the same moves in the same order. Only the moves that differ are reported.
+            list_moves = list(games["list"].legal_moves())
+            if list_moves != legal_moves:
+                only_list, only_bitboard = sorted(set(list_moves) - legal_set), sorted(legal_set - set(list_moves))
+                if only_list or only_bitboard:
+                    record("list.legal_moves, moves only in list and only in bitboard", only_list, only_bitboard)
+                else:
+                    record("list.legal_moves order", "same moves in a different order", "bitboard order")
+                return results
+            position = reference.to_bytes()
+
+            for _ in range(attempts_per_move):
+                start, end = random_attempt(reference, rng)
+                expected = reference.make_move(start, end)
+                results["attempts"] += 1
+                name = next((name for name, message in MOVE_RESULTS.items() if message == expected), str(expected))
+                results["results"][name] = results["results"].get(name, 0) + 1
+                if not check("legal_moves lists " + repr((start, end)), (start, end) in legal_set, expected is True):
+                    return results
+                others = [(backend + ".make_move", game.make_move(start, end)) for backend, game in games.items()
+                          if game is not reference]
+                if batch is not None:
+                    others.append(("batch.step", RESULT_MESSAGES[batch.step([start], [end])[0]]))
+                for method, result in others:
+                    if not check(method + " " + repr((start, end)), result, expected):
+                        return results
+                for backend, game in games.items():
+                    if not check(backend + ".to_bytes", game.to_bytes(), reference.to_bytes()):
+                        return results
+                if batch is not None and not check("batch.get_position", batch.get_position(0), reference.to_bytes()):
+                    return results
+                if expected is True:
+                    for game in games.values():
+                        game.undo_move()
+                    if batch is not None:
+                        batch = BatchGessGame.from_positions([position])
+                    if not check("undo_move", reference.to_bytes(), position):
+                        return results
+
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            for game in games.values():
+                game.make_move(*move)
+            if batch is not None:
+                batch.step([move[0]], [move[1]])
+            moves.append(move)
+    return results
+
+
+def run_perft(max_depth, backends):
+    """Runs perft to each depth up to max_depth on the given backends. Returns each count and time, and whether the
+    counts match PERFT_EXPECTED."""
+    results = {}
+    for backend in backends:
+        for depth in range(1, max_depth + 1):
+            start_time = time.perf_counter()
+            count = perft(BACKENDS[backend](), depth)
+            results[backend + ".perft." + str(depth)] = {
+                "count": count, "seconds": time.perf_counter() - start_time,
+                "expected": PERFT_EXPECTED.get(depth), "ok": PERFT_EXPECTED.get(depth, count) == count}
+    return results
+
+
+def main():
+    """Runs the benchmarks and prints the results as JSON. Exits with status 1 if a perft count is wrong. With --verify,
+    checks the backends against each other instead, and exits with status 1 if they disagree."""
+    parser = argparse.ArgumentParser(description="Benchmark the Gess rules engine.")
+    parser.add_argument("--perft-depth", type=int, default=2, help="deepest perft count to run")
+    parser.add_argument("--perft-backends", nargs="+", choices=sorted(BACKENDS), default=["bitboard"],
+                        help="backends to run perft on")
+    parser.add_argument("--playouts", type=int, default=4, help="random playouts per backend")
+    parser.add_argument("--max-moves", type=int, default=50, help="move limit per playout")
+    parser.add_argument("--batch-games", type=int, default=1024, help="games in the batch playout benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed for sample moves and playouts")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to (default: stdout)")
+    parser.add_argument("--verify", type=int, default=None, metavar="GAMES",
+                        help="instead of benchmarking, check the backends against each other over this many games")
+    args = parser.parse_args()
+
+    results = {"python": platform.python_version(), "platform": platform.platform(), "time": time.time()}
+    if args.verify is not None:
+        results["verify"] = verify_backends(args.verify, args.max_moves, seed=args.seed)
+        ok = results["verify"]["mismatch"] is None
+    else:
+        timings = bench_make_move(find_sample_moves(args.seed))
+        timings.update(bench_helpers())
+        timings.update(bench_playouts(args.playouts, args.max_moves, args.seed))
+        timings.update(bench_batch(args.batch_games, 100, args.seed))
+        results["timings"] = timings
+        results["perft"] = run_perft(args.perft_depth, args.perft_backends)
+        ok = all(result["ok"] for result in results["perft"].values())
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
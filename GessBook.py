@@ -0,0 +1,233 @@
+# Description: Opening book for Gess. Builds best moves for early positions from engine searches, writes them to a
+# sorted binary file keyed by Zobrist hash, and looks positions up through mmap and binary search.
+#
+# File layout: the 8-byte MAGIC, then one 16-byte entry per position sorted by key. Each entry is the position's
+# 64-bit Zobrist hash, the best move packed as in GessRecord (3 bytes), the score for the player to move as a signed
+# 32-bit integer, and the search depth as one byte, all little-endian.
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from GessBackend import BitboardGessGame
+from GessEngine import GessEngine, format_move
+from GessRecord import pack_moves, unpack_moves, read_records
+
+MAGIC = b"GESSBOOK"
+ENTRY = struct.Struct("<Q3siB")
+
+BookEntry = namedtuple("BookEntry", ["move", "score", "depth"])
+
+
+class BookBuilder:
+    """Collects book entries for positions and writes them to a book file. Positions to add are gathered by walking
+    the engine's best lines from the starting position or by replaying early moves of recorded games, and each new
+    position is searched once across a process pool.
+
+    :param depth: Engine search depth for each book position
+    :type depth: int
+    :param time_limit: Seconds per search, or None for no limit
+    :type time_limit: float
+    :param workers: Number of worker processes, or None for one per core
+    :type workers: int
+    """
+
+    def __init__(self, depth=3, time_limit=None, workers=None):
+        """Initializes an empty book with the given search settings."""
+        self._depth = depth
+        self._time_limit = time_limit
+        self._workers = workers
+        self._entries = {}
+
+    def __len__(self):
+        """Returns the number of positions in the book."""
+        return len(self._entries)
+
+    def add_entry(self, key, move, score, depth):
+        """Adds a searched position. An existing entry for the same key is only replaced by a deeper search."""
+        entry = self._entries.get(key)
+        if entry is None or depth > entry.depth:
+            self._entries[key] = BookEntry(move, score, depth)
+
+    def search_positions(self, positions):
+        """Searches every Position not yet in the book across the process pool, and adds the results. Returns the
+        number of positions added."""
+        pending = {}
+        for position in positions:
+            key = position.get_hash()
+            if key not in self._entries and position.get_game_state() == "UNFINISHED":
+                pending[key] = position
+        if not pending:
+            return 0
+        jobs = [(position, self._depth, self._time_limit) for position in pending.values()]
+        with ProcessPoolExecutor(self._workers or os.cpu_count() or 1) as executor:
+            for key, result in zip(pending, executor.map(_search_position, jobs)):
+                if result is not None:
+                    self.add_entry(key, *result)
+        return len(pending)
+
+    def add_best_lines(self, plies, width=2):
+        """Adds the positions reached in the first plies of the engine's best lines from the starting position. At each
+        position the searched best move is followed, along with the next width - 1 moves by shallow score, so the book
+        also covers the likeliest deviations. Returns the number of positions added."""
+        frontier, added = [BitboardGessGame().get_position()], 0
+        for _ in range(plies):
+            added += self.search_positions(frontier)
+            next_frontier = {}
+            for position in frontier:
+                game, entry = position.to_game(BitboardGessGame), self._entries.get(position.get_hash())
+                for move in _candidate_moves(game, entry, width):
+                    game.apply_move(*move)
+                    next_frontier[game.get_hash()] = game.get_position()
+                    game.undo_move()
+            frontier = list(next_frontier.values())
+        return added
+
+    def add_records(self, path, plies):
+        """Adds the positions reached in the first plies of every game in a GessRecord file, such as self-play games
+        saved by GessParallel. Returns the number of positions added."""
+        positions = {}
+        for record in read_records(path):
+            game = BitboardGessGame()
+            for move in record.moves[:plies]:
+                positions[game.get_hash()] = game.get_position()
+                if game.make_move(*move) is not True:
+                    break
+        return self.search_positions(positions.values())
+
+    def write(self, path):
+        """Writes the book to a file, with entries sorted by key for binary search."""
+        with open(path, "wb") as book_file:
+            book_file.write(MAGIC)
+            for key in sorted(self._entries):
+                move, score, depth = self._entries[key]
+                book_file.write(ENTRY.pack(key, pack_moves([move]), score, min(depth, 255)))
+
+
+def _search_position(job):
+    """Worker function for BookBuilder.search_positions. Searches a Position and returns its best move, score and
+    completed depth, or None if it has no legal moves."""
+    position, depth, time_limit = job
+    result = GessEngine(1 << 16).search(position.to_game(BitboardGessGame), depth, time_limit)
+    if result.best_move is None:
+        return None
+    return result.best_move, result.score, result.depth
+
+
+def _candidate_moves(game, entry, width):
+    """Helper function for BookBuilder.add_best_lines. Returns the book move of a position followed by the next best
+    legal moves by static evaluation after the move, up to width moves in total."""
+    engine = GessEngine(1)
+    scored = []
+    for move in game.legal_moves():
+        game.apply_move(*move)
+        finished = game.get_game_state() != "UNFINISHED"
+        scored.append((float("inf") if finished else -engine.evaluate(game), move))
+        game.undo_move()
+    scored.sort(key=lambda item: item[0], reverse=True)
+    moves = [entry.move] if entry is not None else []
+    moves += [move for _, move in scored if move not in moves]
+    return moves[:width]
+
+
+class OpeningBook:
+    """Represents a book file opened through mmap. Lookups binary search the sorted entries in place, so only the
+    pages touched by a search are read and the whole book is never loaded. Can be used as a context manager.
+
+    :param path: Path of the book file
+    :type path: str
+    """
+
+    def __init__(self, path):
+        """Maps the file into memory and checks MAGIC."""
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(path + " is not a Gess opening book")
+        self._count = (len(self._map) - len(MAGIC)) // ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Returns the number of positions in the book."""
+        return self._count
+
+    def lookup(self, key):
+        """Finds the entry for a Zobrist hash by binary search. Returns a BookEntry, or None if the key is not in the
+        book."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = len(MAGIC) + middle * ENTRY.size
+            entry_key = struct.unpack_from("<Q", self._map, offset)[0]
+            if entry_key < key:
+                low = middle + 1
+            elif entry_key > key:
+                high = middle
+            else:
+                _, move, score, depth = ENTRY.unpack_from(self._map, offset)
+                return BookEntry(unpack_moves(move)[0], score, depth)
+        return None
+
+    def probe(self, game):
+        """Looks up the book move for a game's position. The move is checked with make_move and undone, so a hash
+        collision can never return an illegal move. Returns a BookEntry, or None if the position is not in the book."""
+        entry = self.lookup(game.get_hash())
+        if entry is None or game.make_move(*entry.move) is not True:
+            return None
+        game.undo_move()
+        return entry
+
+    def close(self):
+        """Unmaps and closes the file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+def main():
+    """Builds an opening book, or prints the book line from the starting position."""
+    parser = argparse.ArgumentParser(description="Build or read a Gess opening book.")
+    parser.add_argument("mode", choices=["build", "show"])
+    parser.add_argument("book", help="path of the book file")
+    parser.add_argument("--plies", type=int, default=4, help="plies from the starting position to cover")
+    parser.add_argument("--width", type=int, default=2, help="moves followed from each book position")
+    parser.add_argument("--depth", type=int, default=2, help="search depth for each book position")
+    parser.add_argument("--time", type=float, default=None, help="seconds per search")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--records", default=None, help="game record file whose openings are added to the book")
+    args = parser.parse_args()
+
+    if args.mode == "build":
+        start_time = time.perf_counter()
+        builder = BookBuilder(args.depth, args.time, args.workers)
+        builder.add_best_lines(args.plies, args.width)
+        if args.records:
+            builder.add_records(args.records, args.plies)
+        builder.write(args.book)
+        print(json.dumps({"positions": len(builder), "seconds": time.perf_counter() - start_time}))
+    else:
+        with OpeningBook(args.book) as book:
+            game = BitboardGessGame()
+            print(len(book), "positions")
+            while True:
+                entry = book.probe(game)
+                if entry is None:
+                    break
+                print(game.get_curr_player(), format_move(entry.move), "score", entry.score, "depth", entry.depth)
+                game.make_move(*entry.move)
+
+
+if __name__ == "__main__":
+    main()
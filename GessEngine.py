@@ -0,0 +1,291 @@
+# Description: Alpha-beta search engine for Gess. Runs headless on top of the GessBackend rules engine.
+
+import argparse
+import time
+from collections import namedtuple
+
+from GessBackend import BitboardGessGame, coord_to_text
+from GessTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Score of a won position. Wins found closer to the root score higher, so the engine prefers the fastest win.
+WIN_SCORE = 100000
+INFINITY = WIN_SCORE + 1000
+
+# Scores at least this far from zero are wins or losses, counted in plies from the root during a search.
+WIN_BOUND = WIN_SCORE - 1000
+
+# Weights used by the static evaluation.
+STONE_WEIGHT = 10
+RING_WEIGHT = 25
+
+SearchResult = namedtuple("SearchResult", ["best_move", "score", "depth", "pv", "nodes", "elapsed"])
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time or node budget runs out."""
+    pass
+
+
+def score_to_table(score, ply):
+    """Converts a score found ply plies from the root to one counted from the position itself, so a stored win keeps
+    its distance when the position is reached again at another ply. Other scores are returned unchanged."""
+    if score >= WIN_BOUND:
+        return score + ply
+    if score <= -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Converts a score stored by score_to_table back to one counted from the root, for a position ply plies from
+    it."""
+    if score >= WIN_BOUND:
+        return score - ply
+    if score <= -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class GessEngine:
+    """Represents a computer player. Searches a GessGame with iterative-deepening negamax and alpha-beta pruning,
+    ordering moves by the transposition table, killer moves and the history heuristic. Each search stops at the
+    first of its depth, time and node limits, and returns the best move and principal variation of the deepest
+    completed iteration.
+
+    :param table_size: Number of slots in the transposition table
+    :type table_size: int
+    :param book: Opening book whose moves are played without searching, such as a GessBook.OpeningBook, or None
+    :type book: OpeningBook
+    """
+
+    def __init__(self, table_size=1 << 18, book=None):
+        """Initializes engine with an empty transposition table and move ordering tables."""
+        self._table = TranspositionTable(table_size)
+        self._book = book
+        self._history = {}
+        self._killers = []
+        self._pv_table = []
+        self._nodes = 0
+        self._node_limit = None
+        self._deadline = None
+        self._stop = None
+        self._root_moves = None
+
+    def get_table(self):
+        """Returns the engine's transposition table."""
+        return self._table
+
+    def search(self, game, max_depth=64, time_limit=None, node_limit=None, stop=None, alpha=-INFINITY, beta=INFINITY,
+               moves=None):
+        """Finds the best move for the current player of a game. Moves are tried with apply_move and reversed with
+        undo_move, so the game is left unchanged. BitboardGessGame searches much faster than GessGame.
+
+        :param game: Game to search
+        :type game: GessGame
+        :param max_depth: Deepest iteration to search, in plies
+        :type max_depth: int
+        :param time_limit: Wall-clock budget in seconds, or None for no limit
+        :type time_limit: float
+        :param node_limit: Budget in searched positions, or None for no limit
+        :type node_limit: int
+        :param stop: Event that ends the search early when set from another thread, or None
+        :type stop: threading.Event
+        :param alpha: Score the current player already has elsewhere. A score at or below it is only an upper bound.
+        :type alpha: int
+        :param beta: Score the opponent already has elsewhere. A score at or above it is only a lower bound.
+        :type beta: int
+        :param moves: Moves to choose from at the root, or None for every legal move
+        :type moves: list
+        :return: Best move, score for the current player, completed depth, principal variation, nodes and seconds used.
+            best_move is None if the game is over or the current player has no legal moves.
+        :rtype: SearchResult
+        """
+
+        start_time = time.perf_counter()
+
+        # Playing straight from the opening book when the position is in it.
+        if self._book is not None:
+            entry = self._book.probe(game)
+            if entry is not None:
+                return SearchResult(entry.move, entry.score, entry.depth, [entry.move], 0,
+                                    time.perf_counter() - start_time)
+
+        self._deadline = start_time + time_limit if time_limit is not None else None
+        self._node_limit = node_limit
+        self._stop = stop
+        self._root_moves = set(moves) if moves is not None else None
+        self._nodes = 0
+        self._table.new_search()
+        self._history = {}
+        self._killers = [[None, None] for _ in range(max_depth + 1)]
+
+        result = SearchResult(None, 0, 0, [], 0, 0.0)
+        for depth in range(1, max_depth + 1):
+            self._pv_table = [[] for _ in range(depth + 1)]
+            try:
+                score = self._negamax(game, depth, alpha, beta, 0)
+            except SearchTimeout:
+                # Keeps a partial iteration's move only if no iteration has completed.
+                if result.best_move is None and self._pv_table[0]:
+                    result = result._replace(best_move=self._pv_table[0][0], pv=self._pv_table[0][:1])
+                break
+            pv = self._pv_table[0]
+            result = SearchResult(pv[0] if pv else None, score, depth, pv, self._nodes,
+                                  time.perf_counter() - start_time)
+
+            # Stops deepening once the game is decided or there is nothing left to search. A search that fails low
+            # has no principal variation either, but deeper iterations can still raise its score.
+            if (not pv and score > alpha) or abs(score) >= WIN_SCORE - max_depth:
+                break
+
+        # Falls back to the first legal move if the budget ran out before any move was scored.
+        if result.best_move is None:
+            first_move = next(iter(moves if moves is not None else game.legal_moves()), None)
+            if first_move is not None:
+                result = result._replace(best_move=first_move, pv=[first_move])
+        return result._replace(nodes=self._nodes, elapsed=time.perf_counter() - start_time)
+
+    def evaluate(self, game):
+        """Static evaluation of a position from the current player's point of view, based on the difference in
+        stones and rings. Takes the game to evaluate as a parameter. Returns the score as an integer."""
+        curr_sym = game.get_curr_player()[0]
+        opp_sym = "W" if curr_sym == "B" else "B"
+        stones = game.get_stone_count(curr_sym) - game.get_stone_count(opp_sym)
+        rings = game.get_ring_count(curr_sym) - game.get_ring_count(opp_sym)
+        return STONE_WEIGHT * stones + RING_WEIGHT * rings
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """Recursive alpha-beta search. Takes the game, remaining depth, search window, and distance from the root as
+        parameters. Returns the score of the position for the current player."""
+
+        # Checking the budget. The clock and the stop event are only read every 256 nodes.
+        self._nodes += 1
+        if self._node_limit is not None and self._nodes > self._node_limit:
+            raise SearchTimeout
+        if self._nodes & 255 == 0 and self._out_of_time():
+            raise SearchTimeout
+        self._pv_table[ply] = []
+        if depth == 0:
+            return self.evaluate(game)
+
+        # Using a stored result if it was searched deep enough and its bound settles the window.
+        key = game.get_hash()
+        entry = self._table.lookup(key)
+        table_move = None
+        if entry is not None:
+            table_move = entry.move
+            score = score_from_table(entry.score, ply)
+            if entry.depth >= depth and ply > 0:
+                if entry.flag == EXACT or (entry.flag == LOWER_BOUND and score >= beta) or \
+                        (entry.flag == UPPER_BOUND and score <= alpha):
+                    return score
+
+        moves = self._ordered_moves(game, table_move, ply)
+        if ply == 0 and self._root_moves is not None:
+            moves = [move for move in moves if move in self._root_moves]
+        if not moves:
+            return 0
+
+        best_score, best_move = self._search_moves(game, moves, depth, alpha, beta, ply)
+        if best_score <= alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        # A root searched over only some of its moves has no true score to store.
+        if ply > 0 or self._root_moves is None:
+            self._table.store(key, depth, score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def _search_moves(self, game, moves, depth, alpha, beta, ply):
+        """Helper function for _negamax. Searches the moves of a position in order until one causes a cutoff. Returns
+        the best score and the move that scored it."""
+        best_score, best_move = -INFINITY, None
+        for move in moves:
+            game.apply_move(*move)
+            try:
+                # The player who wins keeps the move, so a finished game is scored here instead of in the child.
+                if game.get_game_state() != "UNFINISHED":
+                    score = WIN_SCORE - ply - 1
+                    self._pv_table[ply + 1] = []
+                else:
+                    score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo_move()
+
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+                self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+            if alpha >= beta:
+                self._record_cutoff(move, depth, ply)
+                break
+        return best_score, best_move
+
+    def _out_of_time(self):
+        """Helper function for _negamax. Returns True if the search's deadline has passed or its stop event is set."""
+        if self._stop is not None and self._stop.is_set():
+            return True
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    def _ordered_moves(self, game, table_move, ply):
+        """Helper function for _negamax. Returns the legal moves of a position, with the transposition table move first,
+        then killer moves for the ply, then the rest by history score."""
+        moves = list(game.legal_moves())
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        history = self._history
+
+        def priority(move):
+            if move == table_move:
+                return 3, 0
+            if move in killers:
+                return 2, 0
+            return 1, history.get(move, 0)
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+    def _record_cutoff(self, move, depth, ply):
+        """Helper function for _negamax. Updates killer moves and history scores for a move that caused a cutoff."""
+        self._history[move] = self._history.get(move, 0) + depth * depth
+        if ply < len(self._killers) and self._killers[ply][0] != move:
+            self._killers[ply] = [move, self._killers[ply][0]]
+
+
+def format_move(move):
+    """Converts a (start_center, end_center) move to letter-number text, such as 'c3-c6'."""
+    return coord_to_text(move[0]) + "-" + coord_to_text(move[1])
+
+
+def main():
+    """Plays the engine against itself from the starting position and prints each move."""
+    parser = argparse.ArgumentParser(description="Play Gess engine self-play games in the terminal.")
+    parser.add_argument("--depth", type=int, default=64, help="deepest iteration to search per move")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds to search per move")
+    parser.add_argument("--nodes", type=int, default=None, help="positions to search per move")
+    parser.add_argument("--moves", type=int, default=20, help="maximum number of moves to play")
+    parser.add_argument("--book", default=None, help="opening book file built with GessBook.py")
+    args = parser.parse_args()
+
+    book = None
+    if args.book:
+        from GessBook import OpeningBook
+        book = OpeningBook(args.book)
+    game, engine = BitboardGessGame(), GessEngine(book=book)
+    for _ in range(args.moves):
+        if game.get_game_state() != "UNFINISHED":
+            break
+        player = game.get_curr_player()
+        result = engine.search(game, args.depth, args.time, args.nodes)
+        if result.best_move is None:
+            break
+        game.make_move(*result.best_move)
+        print(player, format_move(result.best_move), "score", result.score, "depth", result.depth, "nodes",
+              result.nodes, "pv", " ".join(format_move(move) for move in result.pv))
+    print(game.get_game_state())
+
+
+if __name__ == "__main__":
+    main()
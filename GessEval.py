@@ -0,0 +1,256 @@
+# Description: Vectorized positional features and static evaluation for Gess with NumPy. Positions are converted to
+# board arrays once, and every feature is computed for both colors of a whole batch of positions with array operations.
+
+import numpy as np
+
+from GessBackend import RING_OFFSETS
+from GessBatch import BatchGessGame, BLACK, WHITE
+from GessEngine import GessEngine, SearchTimeout, WIN_SCORE, INFINITY, STONE_WEIGHT, RING_WEIGHT
+
+# Features computed for each color, in the order of the last axis of compute_features.
+FEATURE_NAMES = ("stones", "rings", "near_rings", "mobility", "threatened")
+
+# Weight of each feature in evaluate_boards. Threatened stones count against their owner, so the player to move
+# gains from the opponent's stones it can capture.
+FEATURE_WEIGHTS = {"stones": STONE_WEIGHT, "rings": RING_WEIGHT, "near_rings": 8, "mobility": 1, "threatened": -3}
+
+# Offsets of the nine squares of a footprint from its center, as (col, row).
+_FOOTPRINT = RING_OFFSETS + ((0, 0),)
+
+# Packed rows of the valid Piece centers, of the centers a ring can surround, and of every square.
+_FULL_ROW = np.uint32((1 << 20) - 1)
+_CENTERS = np.array([0] + [0x7fffe] * 18 + [0], dtype=np.uint32)
+_RING_AREA = np.array([0, 0] + [0x3fffc] * 16 + [0, 0], dtype=np.uint32)
+
+# Number of set bits in each byte value, used to count bits where NumPy is older than 2.0 and has no bitwise_count.
+_BIT_COUNTS = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+_bitwise_count = getattr(np, "bitwise_count", None)
+
+
+def boards_from_games(games):
+    """Converts games, or Positions, to board arrays in the BatchGessGame layout.
+
+    :param games: Games or Positions to convert
+    :type games: list
+    :return: (N, 20, 20) int8 board array, and (N,) int8 array of the player to move as BLACK (1) or WHITE (-1)
+    :rtype: tuple
+    """
+    return boards_from_bytes([game.to_bytes() for game in games])
+
+
+def boards_from_bytes(positions):
+    """Converts positions packed by GessGame.to_bytes to board arrays, unpacking each position once. Returns the board
+    array and the array of players to move, as boards_from_games does."""
+    boards = np.stack([BatchGessGame.position_to_array(position) for position in positions]).astype(np.int8)
+    players = np.array([WHITE if position[100] else BLACK for position in positions], dtype=np.int8)
+    return boards, players
+
+
+def compute_features(boards):
+    """Computes the positional features of both colors for a batch of boards in one pass. Each board is stacked with
+    its negation, so black's and white's features are both computed as the features of the stones valued 1, and each
+    row of stones is packed into the bits of a uint32 so a 3x3 window offset is one row shift and one bit shift.
+
+    * stones: stones on the board
+    * rings: ring centers, with the same rule as GessGame.ring_at
+    * near_rings: centers that would be a ring with one more stone, because seven of the eight squares around them
+      hold the color's stones and the center does not
+    * mobility: moves the color's Pieces could make, ignoring the rule against leaving the mover without a ring
+    * threatened: stones inside the end footprint of at least one of the opponent's moves counted by mobility
+
+    :param boards: (N, 20, 20) board array, with black stones 1, white stones -1 and empty squares 0
+    :type boards: numpy.ndarray
+    :return: (N, 2, len(FEATURE_NAMES)) int32 array, indexed [board, color, feature] with black as color 0
+    :rtype: numpy.ndarray
+    """
+    num_boards = len(boards)
+    stacked = np.concatenate([boards, -boards])
+    own, occupied = _pack_rows(stacked == 1), _pack_rows(stacked != 0)
+
+    # Rings need all eight squares around an empty or opponent center, and near rings all but one of them.
+    neighbors = [_offset(own, row_offset, col_offset) for col_offset, row_offset in RING_OFFSETS]
+    ring_centers = _RING_AREA & ~own
+    rings = np.bitwise_and.reduce(neighbors) & ring_centers
+    near_rings = np.zeros_like(own)
+    for index, missing in enumerate(neighbors):
+        near_rings |= np.bitwise_and.reduce(neighbors[:index] + neighbors[index + 1:]) & ~missing
+    near_rings &= ring_centers
+
+    reach, mobility = _sweep_moves(own, occupied)
+
+    # A stone is threatened if it lies in the footprint of an end center the opponent can reach.
+    covered = np.bitwise_or.reduce([_offset(reach, -row_offset, -col_offset) for col_offset, row_offset in _FOOTPRINT])
+    threatened = own & np.concatenate([covered[num_boards:], covered[:num_boards]])
+
+    features = np.stack([_count_bits(own), _count_bits(rings), _count_bits(near_rings), mobility,
+                         _count_bits(threatened)], axis=-1).astype(np.int32)
+    return features.reshape(2, num_boards, len(FEATURE_NAMES)).transpose(1, 0, 2)
+
+
+def _sweep_moves(own, occupied):
+    """Helper function for compute_features. Follows every direction of every Piece of the packed stones one step at a
+    time, for all boards at once. A ray stops at its first intermediate footprint holding stones that are not part of
+    the Piece, and at the Piece's range. Returns the packed end centers that can be reached, and an (N,) array of the
+    number of moves."""
+
+    # Pieces are footprints without opponent stones, so the only stones where an intermediate footprint overlaps the
+    # starting one belong to the Piece, and only the rest of the intermediate footprint can block.
+    opponent = occupied & ~own
+    pieces = ~np.bitwise_or.reduce([_offset(opponent, row_offset, col_offset)
+                                    for col_offset, row_offset in _FOOTPRINT]) & _CENTERS
+    footprint_stones = np.bitwise_or.reduce([_offset(occupied, row_offset, col_offset)
+                                             for col_offset, row_offset in _FOOTPRINT])
+    reach = np.zeros_like(own)
+    move_counts = np.zeros(own.shape, dtype=np.uint16)
+
+    for col_step, row_step in RING_OFFSETS:
+        moving = pieces & _offset(own, row_step, col_step)
+        for distance in range(1, 18):
+            # Moves beyond three squares need a stone in the center of the Piece.
+            if distance == 4:
+                moving &= own
+            row_shift, col_shift = distance * row_step, distance * col_step
+            ends = _offset(moving, -row_shift, -col_shift) & _CENTERS
+            if not ends.any():
+                break
+            reach |= ends
+            move_counts += _row_bits(ends)
+
+            # Blocking the ray past a footprint that holds stones outside the starting footprint.
+            if distance >= 3:
+                moving &= ~_offset(footprint_stones, row_shift, col_shift)
+            else:
+                for col_offset, row_offset in _FOOTPRINT:
+                    if abs(col_offset + col_shift) > 1 or abs(row_offset + row_shift) > 1:
+                        moving &= ~_offset(occupied, row_shift + row_offset, col_shift + col_offset)
+    return reach, move_counts.sum(axis=1, dtype=np.int64)
+
+
+def _pack_rows(squares):
+    """Helper function for compute_features. Packs a (N, 20, 20) bool array into a (N, 20) uint32 array, with the
+    square in column c of each row as bit c."""
+    packed = np.packbits(squares, axis=2, bitorder="little").astype(np.uint32)
+    return packed[..., 0] | packed[..., 1] << 8 | packed[..., 2] << 16
+
+
+def _offset(rows, row_offset, col_offset):
+    """Helper function for compute_features. Returns packed rows where each square holds the square row_offset rows
+    and col_offset columns away, or no stone where that square is off the board."""
+    result = np.zeros_like(rows)
+    if row_offset >= 0:
+        result[:, :20 - row_offset] = rows[:, row_offset:]
+    else:
+        result[:, -row_offset:] = rows[:, :20 + row_offset]
+    if col_offset >= 0:
+        return result >> col_offset
+    return (result << -col_offset) & _FULL_ROW
+
+
+def _row_bits(rows):
+    """Helper function for compute_features. Returns the number of set bits in each packed row."""
+    if _bitwise_count is not None:
+        return _bitwise_count(rows)
+    return _BIT_COUNTS[rows.view(np.uint8)].reshape(rows.shape + (4,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _count_bits(rows):
+    """Helper function for compute_features. Returns an (N,) array of the number of set bits in each board's rows."""
+    return _row_bits(rows).sum(axis=1, dtype=np.int64)
+
+
+def evaluate_boards(boards, players, weights=None):
+    """Scores a batch of boards for their players to move, as the weighted difference of each feature between the
+    player to move and the opponent.
+
+    :param boards: (N, 20, 20) board array
+    :type boards: numpy.ndarray
+    :param players: (N,) array of the player to move on each board, as BLACK (1) or WHITE (-1)
+    :type players: numpy.ndarray
+    :param weights: Weight of each feature by name, or None for FEATURE_WEIGHTS
+    :type weights: dict
+    :return: (N,) int64 array of scores
+    :rtype: numpy.ndarray
+    """
+    weights = FEATURE_WEIGHTS if weights is None else weights
+    weight_array = np.array([weights.get(name, 0) for name in FEATURE_NAMES], dtype=np.int64)
+    features = compute_features(boards).astype(np.int64)
+    return (features[:, 0] - features[:, 1]) @ weight_array * players.astype(np.int64)
+
+
+def game_features(game):
+    """Returns the features of a single game as a dictionary mapping "B" and "W" to a dictionary of feature values."""
+    boards, _ = boards_from_games([game])
+    features = compute_features(boards)[0]
+    return {symbol: dict(zip(FEATURE_NAMES, features[color].tolist())) for color, symbol in enumerate("BW")}
+
+
+class FeatureEngine(GessEngine):
+    """Represents a computer player that evaluates positions with the vectorized features. At positions one ply above
+    the search horizon, children are evaluated in batches in move order, starting with FIRST_BATCH moves and doubling
+    until one causes a cutoff. Evaluation then costs a few array operations per batch instead of one evaluation call per
+    leaf, while the transposition table and killer moves still cut most positions off after the first batch. The search
+    is otherwise the same as GessEngine.
+
+    :param table_size: Number of slots in the transposition table
+    :type table_size: int
+    :param book: Opening book whose moves are played without searching, or None
+    :type book: OpeningBook
+    :param weights: Weight of each feature by name, or None for FEATURE_WEIGHTS
+    :type weights: dict
+    """
+
+    FIRST_BATCH = 8
+
+    def __init__(self, table_size=1 << 18, book=None, weights=None):
+        """Initializes the engine and its feature weights."""
+        super().__init__(table_size, book)
+        self._weights = weights
+
+    def evaluate(self, game):
+        """Static evaluation of a single position from the current player's point of view, using the vectorized
+        features. Takes the game to evaluate as a parameter. Returns the score as an integer."""
+        boards, players = boards_from_games([game])
+        return int(evaluate_boards(boards, players, self._weights)[0])
+
+    def _search_moves(self, game, moves, depth, alpha, beta, ply):
+        """Helper function for _negamax. Searches the moves of a position in order until one causes a cutoff, scoring
+        the children of positions one ply above the horizon in batches. Returns the best score and the move that scored
+        it."""
+        if depth != 1:
+            return super()._search_moves(game, moves, depth, alpha, beta, ply)
+
+        best_score, best_move = -INFINITY, None
+        start, batch_size = 0, self.FIRST_BATCH
+        while start < len(moves):
+            batch = moves[start:start + batch_size]
+            start, batch_size = start + batch_size, batch_size * 2
+            self._nodes += len(batch)
+            if self._node_limit is not None and self._nodes > self._node_limit:
+                raise SearchTimeout
+            if self._out_of_time():
+                raise SearchTimeout
+
+            for move, score in zip(batch, self._score_children(game, batch, ply)):
+                if score > best_score:
+                    best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self._pv_table[ply] = [move]
+                if alpha >= beta:
+                    self._record_cutoff(move, depth, ply)
+                    return best_score, best_move
+        return best_score, best_move
+
+    def _score_children(self, game, moves, ply):
+        """Helper function for _search_moves. Returns the score of each move for the current player, from one batch
+        evaluation of the positions the moves lead to. The player who wins keeps the move, so finished children are
+        scored as wins instead of evaluated."""
+        children, finished = [], []
+        for move in moves:
+            game.apply_move(*move)
+            children.append(game.to_bytes())
+            finished.append(game.get_game_state() != "UNFINISHED")
+            game.undo_move()
+        scores = -evaluate_boards(*boards_from_bytes(children), self._weights)
+        scores[np.array(finished)] = WIN_SCORE - ply - 1
+        return scores.tolist()
@@ -0,0 +1,96 @@
+# Description: Move history for Gess with checkpointed seeking. Stores the moves of a game along with a Position every
+# few plies, so any ply can be rebuilt by replaying at most that many moves from the nearest checkpoint.
+
+from GessBackend import GessGame
+
+
+class MoveHistory:
+    """Represents the moves of a game and a cursor at the ply being shown. A Position checkpoint is stored every
+    interval plies, at 102 bytes each, so rebuilding any ply replays at most interval - 1 moves with apply_move however
+    long the game is. Recording a move while the cursor is before the last ply discards the later moves, as redo does
+    in an editor.
+
+    :param game: Game whose current position is ply 0, or None for the starting position
+    :type game: GessGame
+    :param interval: Number of plies between checkpoints
+    :type interval: int
+    :param game_class: Class of the games rebuilt by seek, such as GessGame or BitboardGessGame
+    :type game_class: type
+    """
+
+    def __init__(self, game=None, interval=32, game_class=GessGame):
+        """Initializes an empty history with a checkpoint of the first position."""
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        self._interval = interval
+        self._game_class = game_class
+        self._checkpoints = [(game if game is not None else game_class()).get_position()]
+        self._moves = []
+        self._ply = 0
+
+    @classmethod
+    def from_moves(cls, moves, interval=32, game_class=GessGame):
+        """Creates a history of a game played from the starting position, such as the moves of a GameRecord, with the
+        cursor at the last ply. Each move is checked with make_move. Raises ValueError if a move is rejected."""
+        history, game = cls(None, interval, game_class), game_class()
+        for ply, move in enumerate(moves):
+            result = game.make_move(*move)
+            if result is not True:
+                raise ValueError("move {} is illegal: {}".format(ply + 1, result))
+            history.record(game, move)
+        return history
+
+    def __len__(self):
+        """Returns the number of moves in the history."""
+        return len(self._moves)
+
+    def get_ply(self):
+        """Returns the ply at the cursor, from 0 for the first position to len(history) for the last."""
+        return self._ply
+
+    def get_moves(self):
+        """Returns a copy of the list of moves, as (start_center, end_center) pairs."""
+        return list(self._moves)
+
+    def can_undo(self):
+        """Returns True if the cursor can move back a ply."""
+        return self._ply > 0
+
+    def can_redo(self):
+        """Returns True if the cursor can move forward a ply."""
+        return self._ply < len(self._moves)
+
+    def record(self, game, move):
+        """Records a move that has just been made on a game at the cursor's ply, and moves the cursor forward. Any
+        moves after the cursor are discarded first. The game is used to checkpoint the new position when it falls on a
+        checkpoint ply."""
+        del self._moves[self._ply:]
+        del self._checkpoints[self._ply // self._interval + 1:]
+        self._moves.append(tuple(move))
+        self._ply += 1
+        if self._ply % self._interval == 0:
+            self._checkpoints.append(game.get_position())
+
+    def game_at(self, ply):
+        """Returns a new game at the given ply, forked from the nearest checkpoint at or before it and replayed from
+        there with apply_move. The cursor is not moved. Raises IndexError if ply is outside the history."""
+        if not 0 <= ply <= len(self._moves):
+            raise IndexError("ply {} is outside the history of {} moves".format(ply, len(self._moves)))
+        checkpoint = ply // self._interval
+        game = self._checkpoints[checkpoint].to_game(self._game_class)
+        for move in self._moves[checkpoint * self._interval:ply]:
+            game.apply_move(*move)
+        return game
+
+    def seek(self, ply):
+        """Moves the cursor to a ply, clamped to the history, and returns a new game at that ply."""
+        self._ply = max(0, min(ply, len(self._moves)))
+        return self.game_at(self._ply)
+
+    def undo(self):
+        """Moves the cursor back a ply and returns a new game there."""
+        return self.seek(self._ply - 1)
+
+    def redo(self):
+        """Moves the cursor forward a ply and returns a new game there."""
+        return self.seek(self._ply + 1)
@@ -0,0 +1,198 @@
+# Description: Multi-core root-split search and bulk self-play for Gess using a process pool.
+
+import argparse
+import json
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from GessBackend import BitboardGessGame
+from GessEngine import GessEngine, SearchResult, WIN_SCORE, INFINITY
+from GessRecord import GameRecordWriter
+
+GameResult = namedtuple("GameResult", ["index", "seed", "game_state", "moves"])
+
+
+def parallel_search(game, depth, workers=None, time_limit=None):
+    """Searches a game by splitting its root moves across a process pool. A search one ply shallower picks the move
+    most likely to be best, and that move is searched first in this process. The position is then shipped to each
+    worker as a Position, which pickles as 102 bytes, along with the first move's score. Each worker searches its share
+    of the other root moves with one GessEngine, using that score as alpha, so moves that do no better are cut off
+    instead of scored exactly. The first move is kept unless another move beats it, and ties between the workers' moves
+    go to the earliest in legal_moves order.
+
+    :param game: Game to search. It is not changed.
+    :type game: GessGame
+    :param depth: Search depth in plies, counting the root move
+    :type depth: int
+    :param workers: Number of worker processes, or None for one per core
+    :type workers: int
+    :param time_limit: Seconds for the whole search, or None for no limit. A share of moves whose search does not
+        reach the full depth in time is not counted, and if no move reaches it, the shallower search's result is
+        returned.
+    :type time_limit: float
+    :return: Best move and score for the current player, depth, principal variation, nodes and seconds used
+    :rtype: SearchResult
+    """
+
+    start_time = time.perf_counter()
+    root_moves = list(game.legal_moves())
+    if not root_moves:
+        return SearchResult(None, 0, 0, [], 0, 0.0)
+
+    # Searching the likely best move first, so its score can cut off the searches of the others.
+    search_game, engine = game.get_position().to_game(BitboardGessGame), GessEngine()
+    first_move, nodes, ordering = root_moves[0], 0, None
+    if depth > 1:
+        ordering = engine.search(search_game, depth - 1, time_limit)
+        nodes += ordering.nodes
+        if ordering.best_move is not None:
+            first_move = ordering.best_move
+    best = engine.search(search_game, depth, _remaining(start_time, time_limit), moves=[first_move])
+    nodes += best.nodes
+    if not _reached_depth(best, depth):
+        best = best._replace(score=-INFINITY)
+    other_moves = [move for move in root_moves if move != first_move]
+
+    if other_moves:
+        # Dealing root moves out in turn, so every worker gets a similar mix of early and late moves.
+        num_shares = min(len(other_moves), workers or os.cpu_count() or 1)
+        shares = [other_moves[i::num_shares] for i in range(num_shares)]
+        position = game.get_position()
+        with ProcessPoolExecutor(num_shares) as executor:
+            jobs = [executor.submit(_search_root_moves, position, share, depth, best.score,
+                                    _remaining(start_time, time_limit)) for share in shares]
+            for job in jobs:
+                result = job.result()
+                nodes += result.nodes
+                if result.best_move is not None and result.score > best.score:
+                    best = result
+
+    # Falling back to the shallower search if no move was searched to the full depth in time.
+    if best.score == -INFINITY and ordering is not None:
+        return ordering._replace(nodes=nodes, elapsed=time.perf_counter() - start_time)
+    return SearchResult(best.best_move, best.score, depth, best.pv, nodes, time.perf_counter() - start_time)
+
+
+def _remaining(start_time, time_limit):
+    """Helper function for parallel_search. Returns the seconds left of a time limit, or None for no limit."""
+    if time_limit is None:
+        return None
+    return max(0.0, time_limit - (time.perf_counter() - start_time))
+
+
+def _reached_depth(result, depth):
+    """Helper function for parallel_search. Returns True if a search reached the depth, or stopped early because it
+    found a decided game, as GessEngine.search does."""
+    return result.depth >= depth or abs(result.score) >= WIN_SCORE - depth
+
+
+def _search_root_moves(position, moves, depth, alpha, time_limit):
+    """Worker function for parallel_search. Forks the Position into a game, and searches it over only the given root
+    moves, deepening across all of them with the whole time limit. Returns the SearchResult. Its best_move is None
+    unless one of the moves scored above alpha in a search that reached the full depth."""
+
+    game = position.to_game(BitboardGessGame)
+    result = GessEngine().search(game, depth, time_limit, alpha=alpha, moves=moves)
+    if not _reached_depth(result, depth) or result.score <= alpha:
+        return result._replace(best_move=None, pv=[])
+    return result
+
+
+def self_play(num_games, workers=None, depth=2, time_limit=None, node_limit=None, max_moves=200, random_moves=4,
+              seed=0):
+    """Plays engine self-play games across a process pool. Game i is seeded with seed + i, so each game depends only
+    on its own seed and the results are the same for any number of workers. Only seeds are sent to the workers, and
+    each game comes back as its final state and move list.
+
+    :param num_games: Number of games to play
+    :type num_games: int
+    :param workers: Number of worker processes, or None for one per core
+    :type workers: int
+    :param depth: Engine search depth per move. A depth of 0 plays random legal moves.
+    :type depth: int
+    :param time_limit: Seconds per engine move, or None for no limit
+    :type time_limit: float
+    :param node_limit: Positions searched per engine move, or None for no limit
+    :type node_limit: int
+    :param max_moves: Moves after which an unfinished game is stopped
+    :type max_moves: int
+    :param random_moves: Random opening moves played before the engine takes over, so games differ
+    :type random_moves: int
+    :param seed: Seed of the first game
+    :type seed: int
+    :return: Results of every game, in order of game index
+    :rtype: list
+    """
+
+    settings = (depth, time_limit, node_limit, max_moves, random_moves)
+    jobs = [(index, seed + index, settings) for index in range(num_games)]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_play_game, jobs, chunksize=max(1, num_games // (workers * 4))))
+
+
+def _play_game(job):
+    """Worker function for self_play. Plays a single game from its seed and returns a GameResult."""
+    index, game_seed, (depth, time_limit, node_limit, max_moves, random_moves) = job
+    rng = random.Random(game_seed)
+    game, engine = BitboardGessGame(), GessEngine(1 << 16)
+    moves = []
+    while game.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+        if len(moves) < random_moves or depth == 0:
+            legal_moves = list(game.legal_moves())
+            move = rng.choice(legal_moves) if legal_moves else None
+        else:
+            move = engine.search(game, depth, time_limit, node_limit).best_move
+        if move is None:
+            break
+        game.apply_move(*move)
+        moves.append(move)
+    return GameResult(index, game_seed, game.get_game_state(), moves)
+
+
+def summarize(results):
+    """Returns a dictionary of win counts and game lengths for a list of GameResults."""
+    summary = {"games": len(results), "BLACK_WON": 0, "WHITE_WON": 0, "UNFINISHED": 0, "moves": 0}
+    for result in results:
+        summary[result.game_state] += 1
+        summary["moves"] += len(result.moves)
+    summary["average_length"] = summary["moves"] / len(results) if results else 0
+    return summary
+
+
+def main():
+    """Runs a parallel search of the starting position or a batch of self-play games, and prints the result as
+    JSON."""
+    parser = argparse.ArgumentParser(description="Parallel Gess search and self-play.")
+    parser.add_argument("mode", choices=["search", "selfplay"])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--depth", type=int, default=2, help="search depth in plies")
+    parser.add_argument("--time", type=float, default=None, help="seconds per search")
+    parser.add_argument("--nodes", type=int, default=None, help="positions per self-play search")
+    parser.add_argument("--games", type=int, default=32, help="number of self-play games")
+    parser.add_argument("--max-moves", type=int, default=200, help="move limit per self-play game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first self-play game")
+    parser.add_argument("--record", default=None, help="game record file to append self-play games to")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.mode == "search":
+        result = parallel_search(BitboardGessGame(), args.depth, args.workers, args.time)
+        output = {"best_move": result.best_move, "score": result.score, "pv": result.pv, "nodes": result.nodes}
+    else:
+        results = self_play(args.games, args.workers, args.depth, args.time, args.nodes, args.max_moves,
+                            seed=args.seed)
+        output = summarize(results)
+        if args.record:
+            with GameRecordWriter(args.record) as writer:
+                for result in results:
+                    writer.write_game(result.moves, result.game_state)
+    output["seconds"] = time.perf_counter() - start_time
+    print(json.dumps(output))
+
+
+if __name__ == "__main__":
+    main()
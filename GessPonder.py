@@ -0,0 +1,146 @@
+# Description: Runs a Gess computer player in a background thread, so a GUI stays responsive while it thinks. The
+# engine ponders on the opponent's predicted reply during the opponent's turn, and keeps searching that position if
+# the prediction is right.
+
+import threading
+import time
+
+from GessBackend import BitboardGessGame
+from GessEngine import GessEngine
+
+
+class _SearchJob:
+    """Represents one search running in the background thread. A think job delivers its result when the search ends.
+    A ponder job only delivers its result once the position it searches is reached and think is called for it."""
+
+    __slots__ = ("key", "stop", "deliver", "result", "thread", "timer", "start_time")
+
+    def __init__(self, position, deliver):
+        """Initializes a job for a Position."""
+        self.key = position.get_hash()
+        self.stop = threading.Event()
+        self.deliver = deliver
+        self.result = None
+        self.thread = None
+        self.timer = None
+        self.start_time = time.perf_counter()
+
+
+class BackgroundEngine:
+    """Represents a computer player running in a background thread. think starts choosing a move and returns at once,
+    and the result is passed to the post function from the search thread, along with the hash of the position searched
+    so a stale result can be recognized. A GUI can post it as an event, since only the event queue is shared with the
+    search thread.
+
+    After each move it plays, the engine can ponder: it searches the position after the reply its principal variation
+    predicts, with no time limit, until think is called. If the opponent played the predicted reply, the ponder search
+    continues with the rest of the think time, and its result is posted at once if pondering already used it up.
+    Otherwise the ponder search is stopped and a new search starts. Only one search runs at a time, so the engine and
+    its transposition table are never shared between threads.
+
+    :param post: Function called with (position_hash, SearchResult) when a move has been chosen
+    :type post: function
+    :param engine: Engine to search with, or None for a new GessEngine
+    :type engine: GessEngine
+    :param think_time: Seconds to spend choosing each move
+    :type think_time: float
+    :param max_depth: Deepest iteration to search, in plies
+    :type max_depth: int
+    """
+
+    def __init__(self, post, engine=None, think_time=2.0, max_depth=64):
+        """Initializes the player. No thread runs until think or ponder is called."""
+        self._post = post
+        self._engine = engine if engine is not None else GessEngine()
+        self._think_time = think_time
+        self._max_depth = max_depth
+        self._lock = threading.Lock()
+        self._job = None
+        self._last_result = None
+        self._stats = {"thinks": 0, "ponders": 0, "ponder_hits": 0}
+
+    def get_stats(self):
+        """Returns a copy of the counts of moves thought about, ponder searches started, and predictions that hit."""
+        with self._lock:
+            return dict(self._stats)
+
+    def is_thinking(self):
+        """Returns True if a search whose result will be posted is running."""
+        with self._lock:
+            return self._job is not None and self._job.deliver and self._job.result is None
+
+    def think(self, game):
+        """Starts choosing a move for the current player of a game and returns without waiting. The game is copied, so
+        it may change while the search runs."""
+        position = game.get_position()
+        with self._lock:
+            self._stats["thinks"] += 1
+            job = self._job
+            hit = job is not None and not job.deliver and job.key == position.get_hash()
+            if hit:
+                self._stats["ponder_hits"] += 1
+                job.deliver = True
+                result = job.result
+                if result is None:
+                    remaining = self._think_time - (time.perf_counter() - job.start_time)
+                    if remaining <= 0:
+                        job.stop.set()
+                    else:
+                        job.timer = threading.Timer(remaining, job.stop.set)
+                        job.timer.daemon = True
+                        job.timer.start()
+        if hit:
+            if result is not None:
+                self._deliver(job.key, result)
+            return
+        self.cancel()
+        self._start(position, True, self._think_time)
+
+    def ponder(self, game):
+        """Starts searching the position after the reply predicted by the last move's principal variation, if there is
+        one and it is legal in the game. Returns True if pondering started."""
+        result = self._last_result
+        if result is None or len(result.pv) < 2 or game.get_game_state() != "UNFINISHED":
+            return False
+        predicted_game = game.get_position().to_game(BitboardGessGame)
+        if predicted_game.make_move(*result.pv[1]) is not True or predicted_game.get_game_state() != "UNFINISHED":
+            return False
+        self.cancel()
+        with self._lock:
+            self._stats["ponders"] += 1
+        self._start(predicted_game.get_position(), False, None)
+        return True
+
+    def cancel(self):
+        """Stops any running search without posting its result, and waits for the search thread to end."""
+        with self._lock:
+            job, self._job = self._job, None
+            if job is not None:
+                job.deliver = False
+        if job is not None:
+            job.stop.set()
+            if job.timer is not None:
+                job.timer.cancel()
+            job.thread.join()
+
+    def _start(self, position, deliver, time_limit):
+        """Helper function for think and ponder. Starts a search of a Position in a new daemon thread."""
+        job = _SearchJob(position, deliver)
+        job.thread = threading.Thread(target=self._run, args=(job, position, time_limit), daemon=True)
+        with self._lock:
+            self._job = job
+        job.thread.start()
+
+    def _run(self, job, position, time_limit):
+        """Search thread. Searches the position, then posts the result if the job should deliver it."""
+        result = self._engine.search(position.to_game(BitboardGessGame), self._max_depth, time_limit, stop=job.stop)
+        with self._lock:
+            job.result = result
+            deliver = job.deliver
+        if deliver:
+            self._deliver(job.key, result)
+
+    def _deliver(self, key, result):
+        """Helper function for think and _run. Records a chosen move's result for pondering, and posts it."""
+        self._last_result = result
+        self._post(key, result)
@@ -0,0 +1,177 @@
+# Description: Compact binary game records for Gess, with a streaming writer, a streaming reader, lazy replay through
+# GessGame, and memory-mapped archives for scanning and indexing large numbers of games.
+#
+# File layout: the 8-byte MAGIC, followed by one record per game. Each record is a 3-byte header (game state byte,
+# numbered as in GessBackend.GAME_STATES, then the move count as a little-endian uint16) and 3 bytes per move. A move
+# packs its start and end centers, each numbered (row - 1) * 18 + (col - 1), as start * 324 + end in a little-endian
+# 24-bit integer.
+
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+
+from GessBackend import GessGame, GAME_STATES
+
+MAGIC = b"GESSREC1"
+HEADER = struct.Struct("<BH")
+MOVE_SIZE = 3
+
+GameRecord = namedtuple("GameRecord", ["game_state", "moves"])
+
+
+def pack_moves(moves):
+    """Packs a list of (start_center, end_center) moves into 3 bytes per move."""
+    data = bytearray()
+    for start, end in moves:
+        value = ((start[1] - 1) * 18 + start[0] - 1) * 324 + (end[1] - 1) * 18 + end[0] - 1
+        data += value.to_bytes(MOVE_SIZE, "little")
+    return bytes(data)
+
+
+def unpack_moves(data):
+    """Unpacks moves packed by pack_moves. Returns a list of (start_center, end_center) tuples."""
+    moves = []
+    for offset in range(0, len(data), MOVE_SIZE):
+        start, end = divmod(int.from_bytes(data[offset:offset + MOVE_SIZE], "little"), 324)
+        moves.append(((start % 18 + 1, start // 18 + 1), (end % 18 + 1, end // 18 + 1)))
+    return moves
+
+
+class GameRecordWriter:
+    """Writes game records to a binary file one game at a time, so games can be streamed to disk as they finish.
+    Can be used as a context manager.
+
+    :param path: Path of the file to write. An existing file is appended to.
+    :type path: str
+    """
+
+    def __init__(self, path):
+        """Opens the file and writes MAGIC if the file is new or empty."""
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_game(self, moves, game_state):
+        """Writes one game. Takes the list of (start_center, end_center) moves and the final game state string, such
+        as "BLACK_WON", as parameters."""
+        if len(moves) > 0xFFFF:
+            raise ValueError("A game record holds at most 65535 moves")
+        self._file.write(HEADER.pack(GAME_STATES.index(game_state), len(moves)) + pack_moves(moves))
+        self._count += 1
+
+    def get_count(self):
+        """Returns the number of games written since the file was opened."""
+        return self._count
+
+    def close(self):
+        """Flushes and closes the file."""
+        self._file.close()
+
+
+def read_records(path):
+    """Generator that streams GameRecords from a file in order, reading one record at a time."""
+    with open(path, "rb") as record_file:
+        if record_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a Gess game record file")
+        while True:
+            header = record_file.read(HEADER.size)
+            if not header:
+                return
+            game_state, num_moves = HEADER.unpack(header)
+            yield GameRecord(GAME_STATES[game_state], unpack_moves(record_file.read(num_moves * MOVE_SIZE)))
+
+
+def replay(record, game_class=GessGame):
+    """Generator that replays a record move by move. Yields the move and the game after each move is made, reusing the
+    same game object, so only the positions that are consumed are computed. Raises ValueError if the record holds an
+    illegal move.
+
+    :param record: Record to replay
+    :type record: GameRecord
+    :param game_class: Game class to replay with, such as GessGame or BitboardGessGame
+    :type game_class: type
+    """
+    game = game_class()
+    for move in record.moves:
+        result = game.make_move(*move)
+        if result is not True:
+            raise ValueError("Illegal move in record: " + str(move) + " (" + result + ")")
+        yield move, game
+
+
+class GameArchive:
+    """Represents a game record file opened through mmap. Records are decoded only when they are accessed, so
+    archives much larger than memory can be scanned. Includes methods for scanning record headers, building an offset
+    index for random access, and iterating records. Can be used as a context manager.
+
+    :param path: Path of the record file
+    :type path: str
+    """
+
+    def __init__(self, path):
+        """Maps the file into memory and checks MAGIC."""
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(path + " is not a Gess game record file")
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def headers(self, start=None, end=None):
+        """Generator that yields (offset, game_state, num_moves) for each record, skipping over the moves without
+        decoding them. Takes optional start and end byte offsets as parameters, to scan only the records that start
+        in that range. start must be the offset of a record."""
+        offset = len(MAGIC) if start is None else start
+        size = len(self._map) if end is None else min(end, len(self._map))
+        while offset < size:
+            game_state, num_moves = HEADER.unpack_from(self._map, offset)
+            yield offset, GAME_STATES[game_state], num_moves
+            offset += HEADER.size + num_moves * MOVE_SIZE
+
+    def build_index(self):
+        """Builds the offset of every record as a compact array of 8-byte integers, enabling len() and indexing.
+        Returns the index."""
+        self._index = array("Q", (offset for offset, _, _ in self.headers()))
+        return self._index
+
+    def record_at(self, offset):
+        """Decodes the record starting at the given byte offset."""
+        game_state, num_moves = HEADER.unpack_from(self._map, offset)
+        start = offset + HEADER.size
+        return GameRecord(GAME_STATES[game_state], unpack_moves(self._map[start:start + num_moves * MOVE_SIZE]))
+
+    def __len__(self):
+        """Returns the number of records. Builds the index on first use."""
+        if self._index is None:
+            self.build_index()
+        return len(self._index)
+
+    def __getitem__(self, number):
+        """Returns the record with the given number. Builds the index on first use."""
+        if self._index is None:
+            self.build_index()
+        return self.record_at(self._index[number])
+
+    def __iter__(self):
+        """Iterates over every record in file order."""
+        for offset, _, _ in self.headers():
+            yield self.record_at(offset)
+
+    def close(self):
+        """Unmaps and closes the file."""
+        self._map.close()
+        self._file.close()
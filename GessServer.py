@@ -0,0 +1,301 @@
+# Description: Headless asyncio server hosting many concurrent Gess games over a line-delimited JSON TCP protocol,
+# with a bundled load-generator client.
+#
+# Each request is one JSON object per line, and each response is one JSON object per line. Requests may carry an
+# "id" value, which is echoed back in the response.
+#   {"op": "create"}                                        -> {"ok": true, "game_id": ..., "state": {...}}
+#   {"op": "move", "game_id": ..., "start": "c3", "end": "c6"} -> {"ok": true, "result": true, "state": {...}}
+#   {"op": "resign", "game_id": ...}                        -> {"ok": true, "state": {...}}
+#   {"op": "state", "game_id": ...}                         -> {"ok": true, "state": {...}}
+# A rejected move returns "ok": true with the make_move message as "result". Malformed requests, unknown games, and
+# creating a game while the server is full of games with moves in progress return {"ok": false, "error": ...}.
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from GessBackend import BitboardGessGame, coord_to_text
+
+# Longest request line accepted, in bytes.
+MAX_LINE = 4096
+
+
+class GameSession:
+    """Represents one hosted game. Holds the game, a lock that serializes its moves, and the time of its last
+    request."""
+
+    __slots__ = ("game", "lock", "last_active", "num_moves")
+
+    def __init__(self):
+        """Initializes a new game at the starting position."""
+        self.game = BitboardGessGame()
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+        self.num_moves = 0
+
+
+class GessServer:
+    """Represents a server hosting Gess games. Rules are evaluated in a thread pool so the event loop keeps serving
+    other clients, and each game's lock keeps its moves in order. Games idle for longer than idle_timeout are evicted,
+    and the least recently used game is evicted when max_games is reached, so memory stays bounded.
+
+    :param host: Interface to listen on
+    :type host: str
+    :param port: Port to listen on. Port 0 picks a free port.
+    :type port: int
+    :param idle_timeout: Seconds after which an idle game is evicted
+    :type idle_timeout: float
+    :param max_games: Largest number of games held at once
+    :type max_games: int
+    :param workers: Number of threads evaluating moves
+    :type workers: int
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, idle_timeout=300.0, max_games=10000, workers=4):
+        """Initializes server settings. The server starts listening when start is called."""
+        self._host, self._port = host, port
+        self._idle_timeout = idle_timeout
+        self._max_games = max_games
+        self._executor = ThreadPoolExecutor(workers)
+        self._sessions = OrderedDict()
+        self._game_ids = itertools.count(1)
+        self._server = None
+        self._evictor = None
+        self._stats = {"requests": 0, "created": 0, "evicted": 0, "errors": 0}
+
+    def get_port(self):
+        """Returns the port the server is listening on."""
+        return self._server.sockets[0].getsockname()[1] if self._server else self._port
+
+    def get_stats(self):
+        """Returns a copy of the server's request counters, along with the number of games held."""
+        return dict(self._stats, games=len(self._sessions))
+
+    async def start(self):
+        """Starts listening for connections and starts the idle game evictor."""
+        self._server = await asyncio.start_server(self._handle_client, self._host, self._port, limit=MAX_LINE)
+        self._evictor = asyncio.ensure_future(self._evict_idle_games())
+
+    async def serve_forever(self):
+        """Starts the server if needed and serves until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stops accepting connections, stops the evictor, and shuts down the thread pool."""
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def _handle_client(self, reader, writer):
+        """Serves one connection, answering each request line in order until the client disconnects."""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    response = {"ok": False, "error": "request line too long"}
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    break
+                if not line:
+                    break
+                response = await self._handle_line(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_line(self, line):
+        """Parses and dispatches a single request line. Returns the response as a dictionary."""
+        self._stats["requests"] += 1
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            handler = {"create": self._create, "move": self._move, "resign": self._resign,
+                       "state": self._state}.get(request.get("op"))
+            if handler is None:
+                raise ValueError("unknown op: " + str(request.get("op")))
+            response = await handler(request)
+        except KeyError as error:
+            self._stats["errors"] += 1
+            response = {"ok": False, "error": "missing field: " + str(error.args[0])}
+        except (ValueError, TypeError, RecursionError) as error:
+            self._stats["errors"] += 1
+            response = {"ok": False, "error": str(error)}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def _create(self, request):
+        """Creates a game, evicting the least recently used games if the server is full. Games with a move in progress
+        are skipped, as _evict_idle_games does."""
+        while len(self._sessions) >= self._max_games:
+            game_id = next((game_id for game_id, session in self._sessions.items() if not session.lock.locked()), None)
+            if game_id is None:
+                raise ValueError("server is full")
+            del self._sessions[game_id]
+            self._stats["evicted"] += 1
+        game_id = str(next(self._game_ids))
+        session = self._sessions[game_id] = GameSession()
+        self._stats["created"] += 1
+        return {"ok": True, "game_id": game_id, "state": self._describe(game_id, session)}
+
+    async def _move(self, request):
+        """Attempts a move. The rules run in the thread pool while holding the game's lock."""
+        game_id, session = self._session(request)
+        start, end = parse_coord(request["start"]), parse_coord(request["end"])
+        async with session.lock:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, session.game.make_move, start, end)
+            if result is True:
+                session.num_moves += 1
+            return {"ok": True, "result": result, "state": self._describe(game_id, session)}
+
+    async def _resign(self, request):
+        """Resigns the game for its current player."""
+        game_id, session = self._session(request)
+        async with session.lock:
+            session.game.resign_game()
+            return {"ok": True, "state": self._describe(game_id, session)}
+
+    async def _state(self, request):
+        """Returns the state of a game. Waits for any move in progress, so the state is never read halfway through
+        one."""
+        game_id, session = self._session(request)
+        async with session.lock:
+            return {"ok": True, "state": self._describe(game_id, session)}
+
+    def _session(self, request):
+        """Looks up the game named by a request and marks it as recently used. Returns the game id and session."""
+        game_id = str(request["game_id"])
+        session = self._sessions.get(game_id)
+        if session is None:
+            raise ValueError("unknown game: " + game_id)
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(game_id)
+        return game_id, session
+
+    def _describe(self, game_id, session):
+        """Returns the JSON description of a game."""
+        game = session.game
+        return {"game_id": game_id, "curr_player": game.get_curr_player(), "game_state": game.get_game_state(),
+                "moves": session.num_moves, "black": [coord_to_text(stone) for stone in game.get_black_stones()],
+                "white": [coord_to_text(stone) for stone in game.get_white_stones()]}
+
+    async def _evict_idle_games(self):
+        """Background task that evicts games idle for longer than idle_timeout. Games are kept in order of last use,
+        so only the oldest games need to be checked."""
+        while True:
+            await asyncio.sleep(min(self._idle_timeout, 10.0))
+            cutoff = time.monotonic() - self._idle_timeout
+            while self._sessions:
+                game_id, session = next(iter(self._sessions.items()))
+                if session.last_active > cutoff or session.lock.locked():
+                    break
+                del self._sessions[game_id]
+                self._stats["evicted"] += 1
+
+
+def parse_coord(value):
+    """Converts a request coordinate, either letter-number text such as "c3" or a [col, row] list, to a (col, row)
+    tuple. Raises ValueError for anything else."""
+    if isinstance(value, str) and len(value) >= 2 and value[0].isalpha() and value[1:].isdigit():
+        return ord(value[0].lower()) - 97, int(value[1:]) - 1
+    if isinstance(value, list) and len(value) == 2 and all(isinstance(number, int) for number in value):
+        return value[0], value[1]
+    raise ValueError("invalid coordinate: " + repr(value))
+
+
+async def _load_client(host, port, num_games, max_moves, rng, latencies):
+    """Load generator client. Plays random legal games over one connection, choosing moves from a local mirror of
+    each game, and records the latency of every request. Returns the number of moves rejected by the server."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    mismatches = 0
+
+    async def request(message):
+        start_time = time.perf_counter()
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start_time)
+        return response
+
+    for _ in range(num_games):
+        game_id = (await request({"op": "create"}))["game_id"]
+        mirror = BitboardGessGame()
+        for _ in range(max_moves):
+            legal_moves = list(mirror.legal_moves())
+            if not legal_moves:
+                break
+            start, end = rng.choice(legal_moves)
+            mirror.make_move(start, end)
+            response = await request({"op": "move", "game_id": game_id, "start": coord_to_text(start),
+                                      "end": coord_to_text(end)})
+            if response.get("result") is not True:
+                mismatches += 1
+                break
+            if mirror.get_game_state() != "UNFINISHED":
+                break
+    writer.close()
+    return mismatches
+
+
+async def run_load(host, port, clients, games_per_client, max_moves, seed=0):
+    """Runs the load generator with the given number of concurrent clients. Returns a dictionary with request
+    throughput, latency percentiles in milliseconds, and the number of moves the server rejected."""
+    latencies = []
+    start_time = time.perf_counter()
+    mismatches = await asyncio.gather(*(_load_client(host, port, games_per_client, max_moves,
+                                                     random.Random(seed + client), latencies)
+                                        for client in range(clients)))
+    seconds = time.perf_counter() - start_time
+    latencies.sort()
+
+    def percentile(fraction):
+        return 1000 * latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+
+    return {"clients": clients, "requests": len(latencies), "seconds": seconds,
+            "requests_per_second": len(latencies) / seconds, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99), "rejected_moves": sum(mismatches)}
+
+
+def main():
+    """Runs the game server, or the load generator against a running server."""
+    parser = argparse.ArgumentParser(description="Headless Gess game server and load generator.")
+    parser.add_argument("mode", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an idle game is evicted")
+    parser.add_argument("--max-games", type=int, default=10000, help="largest number of games held at once")
+    parser.add_argument("--workers", type=int, default=4, help="threads evaluating moves")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent load generator clients")
+    parser.add_argument("--games", type=int, default=2, help="games played by each load generator client")
+    parser.add_argument("--max-moves", type=int, default=50, help="moves per load generator game")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        server = GessServer(args.host, args.port, args.idle_timeout, args.max_games, args.workers)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(run_load(args.host, args.port, args.clients, args.games, args.max_moves))))
+
+
+if __name__ == "__main__":
+    main()
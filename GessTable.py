@@ -0,0 +1,91 @@
+# Description: Bounded transposition table for Gess positions, keyed by the Zobrist hash from GessGame.get_hash().
+
+from collections import namedtuple
+
+# Kinds of stored scores. An EXACT score is the true value of the position at the stored depth, a LOWER_BOUND score
+# caused a beta cutoff, and an UPPER_BOUND score never raised alpha.
+EXACT, LOWER_BOUND, UPPER_BOUND = "EXACT", "LOWER_BOUND", "UPPER_BOUND"
+
+TableEntry = namedtuple("TableEntry", ["key", "depth", "score", "flag", "move", "generation"])
+
+
+class TranspositionTable:
+    """Represents a fixed-size table of position results. Each position hash maps to a single slot, so memory use is
+    bounded by the number of slots no matter how many positions are stored. Includes methods for storing and looking
+    up results, and for starting a new search so results from older searches are replaced first.
+
+    :param size: Number of slots in the table, rounded up to a power of two
+    :type size: int
+    """
+
+    def __init__(self, size=1 << 18):
+        """Initializes the table with every slot empty."""
+        num_slots = 1
+        while num_slots < size:
+            num_slots <<= 1
+        self._mask = num_slots - 1
+        self._slots = [None] * num_slots
+        self._generation = 0
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "replacements": 0, "rejected": 0}
+        self._filled = 0
+
+    def __len__(self):
+        """Returns the number of filled slots."""
+        return self._filled
+
+    def __contains__(self, key):
+        """Returns True if a result for the position hash is stored, otherwise False."""
+        entry = self._slots[key & self._mask]
+        return entry is not None and entry.key == key
+
+    def get_size(self):
+        """Returns the number of slots in the table."""
+        return len(self._slots)
+
+    def get_stats(self):
+        """Returns a copy of the table's lookup and store counters as a dictionary."""
+        return dict(self._stats, filled=self._filled, size=len(self._slots))
+
+    def new_search(self):
+        """Marks the start of a new search. Entries stored by earlier searches stay available for lookups, but are
+        always replaced by newer results. Takes no parameters."""
+        self._generation += 1
+
+    def lookup(self, key):
+        """Looks up a position hash. Returns the stored TableEntry, or None if the position is not stored."""
+        self._stats["lookups"] += 1
+        entry = self._slots[key & self._mask]
+        if entry is None or entry.key != key:
+            return None
+        self._stats["hits"] += 1
+        return entry
+
+    def store(self, key, depth, score, flag, move=None):
+        """Stores a result for a position hash. The slot's current entry is replaced if it is empty, holds the same
+        position, comes from an earlier search, or was searched no deeper than the new result. Takes the position hash,
+        search depth, score, score flag (EXACT, LOWER_BOUND or UPPER_BOUND) and best move as parameters. Returns True
+        if the result was stored, otherwise False."""
+
+        index = key & self._mask
+        entry = self._slots[index]
+        if entry is None:
+            self._filled += 1
+        elif entry.key != key and entry.generation == self._generation and entry.depth > depth:
+            self._stats["rejected"] += 1
+            return False
+        elif entry.key != key:
+            self._stats["replacements"] += 1
+
+        # Keeps the previous best move when a shallower result for the same position doesn't have one.
+        if move is None and entry is not None and entry.key == key:
+            move = entry.move
+        self._slots[index] = TableEntry(key, depth, score, flag, move, self._generation)
+        self._stats["stores"] += 1
+        return True
+
+    def clear(self):
+        """Removes every entry from the table and resets its counters. Takes no parameters."""
+        self._slots = [None] * len(self._slots)
+        self._generation = 0
+        self._stats = dict.fromkeys(self._stats, 0)
+        self._filled = 0